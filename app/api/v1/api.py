@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, posts, comments, tags
+from app.api.v1.endpoints import auth, users, posts, comments, tags, feed, health
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -7,3 +7,5 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(posts.router, prefix="/posts", tags=["posts"])
 api_router.include_router(comments.router, prefix="/comments", tags=["comments"])
 api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
+api_router.include_router(feed.router, prefix="/feed", tags=["feed"])
+api_router.include_router(health.router, prefix="/health", tags=["health"])
@@ -4,14 +4,16 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import create_access_token
 from app.core.config import settings
+from app.core.timing import TimedRoute
 from app.crud.user import user
-from app.db.session import get_db
+from app.db.routing import get_db
 from app.schemas.token import Token
 from app.schemas.user import User
+from utils.deps import get_current_active_user, login_rate_limit
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(login_rate_limit)])
 async def login(
     db: AsyncSession = Depends(get_db),
     form_data: OAuth2PasswordRequestForm = Depends()
@@ -30,5 +32,5 @@ async def login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login/test-token", response_model=User)
-async def test_token(current_user: User = Depends(user.get_current_active_user)):
+async def test_token(current_user: User = Depends(get_current_active_user)):
     return current_user
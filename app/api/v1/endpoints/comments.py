@@ -1,27 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+from app.core.cache import cached_response
+from app.core.config import settings
+from app.core.timing import TimedRoute
 from app.crud.comment import comment
 from app.crud.user import user
-from app.db.session import get_db
+from app.db.routing import get_db
 from app.schemas.comment import Comment, CommentCreate, CommentUpdate
-from app.core.security import get_current_active_user
+from utils.deps import comment_write_rate_limit, get_current_active_user
 from app.schemas.user import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/", response_model=List[Comment])
+@cached_response(
+    "comment", List[Comment], ttl=settings.CACHE_TTL_COMMENT, params=("skip", "limit", "cursor", "post_id")
+)
 async def read_comments(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     post_id: int = None,
 ):
     if post_id:
-        return await comment.get_multi_by_post(db, post_id=post_id, skip=skip, limit=limit)
-    return await comment.get_multi(db, skip=skip, limit=limit)
+        return await comment.get_multi_by_post(
+            db, post_id=post_id, skip=skip, limit=limit, cursor=cursor
+        )
+    return await comment.get_multi(db, skip=skip, limit=limit, cursor=cursor)
 
-@router.post("/", response_model=Comment)
+@router.get("/threads", response_model=List[Comment])
+@cached_response(
+    "comment", List[Comment], ttl=settings.CACHE_TTL_COMMENT, params=("post_id", "limit", "cursor")
+)
+async def read_comment_threads(
+    post_id: int,
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """Discussion of a post: `limit` top-level comments, oldest first, each
+    followed by its replies depth-first (`parent_id`, `depth`). The cursor
+    continues after the last top-level comment."""
+    return await comment.get_threads(db, post_id=post_id, limit=limit, cursor=cursor)
+
+@router.post("/", response_model=Comment, dependencies=[Depends(comment_write_rate_limit)])
 async def create_comment(
     *,
     db: AsyncSession = Depends(get_db),
@@ -29,10 +53,20 @@ async def create_comment(
     post_id: int,
     current_user: User = Depends(get_current_active_user),
 ):
-    comment_in.post_id = post_id
-    return await comment.create(db, obj_in=comment_in)
+    parent = None
+    if comment_in.parent_id is not None:
+        parent = await comment.get(db, id=comment_in.parent_id, load=None)
+        if not parent or parent.post_id != post_id:
+            raise HTTPException(
+                status_code=400,
+                detail="The parent comment does not exist on this post.",
+            )
+    return await comment.create(
+        db, obj_in=comment_in, post_id=post_id, author_id=current_user.id, parent=parent
+    )
 
 @router.get("/{comment_id}", response_model=Comment)
+@cached_response("comment", Comment, ttl=settings.CACHE_TTL_COMMENT, id_param="comment_id")
 async def read_comment(
     comment_id: int,
     db: AsyncSession = Depends(get_db),
@@ -45,7 +79,28 @@ async def read_comment(
         )
     return db_comment
 
-@router.put("/{comment_id}", response_model=Comment)
+@router.get("/{comment_id}/thread", response_model=List[Comment])
+@cached_response(
+    "comment", List[Comment], ttl=settings.CACHE_TTL_COMMENT, params=("comment_id", "limit", "cursor")
+)
+async def read_comment_thread(
+    comment_id: int,
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    """The comment followed by all replies below it, depth-first."""
+    db_comment = await comment.get(db, id=comment_id, load=None)
+    if not db_comment:
+        raise HTTPException(
+            status_code=404,
+            detail="The comment with this id does not exist.",
+        )
+    return await comment.get_subtree(db, db_obj=db_comment, limit=limit, cursor=cursor)
+
+@router.put(
+    "/{comment_id}", response_model=Comment, dependencies=[Depends(comment_write_rate_limit)]
+)
 async def update_comment(
     *,
     db: AsyncSession = Depends(get_db),
@@ -66,7 +121,9 @@ async def update_comment(
         )
     return await comment.update(db, db_obj=db_comment, obj_in=comment_in)
 
-@router.delete("/{comment_id}", response_model=Comment)
+@router.delete(
+    "/{comment_id}", response_model=Comment, dependencies=[Depends(comment_write_rate_limit)]
+)
 async def delete_comment(
     *,
     db: AsyncSession = Depends(get_db),
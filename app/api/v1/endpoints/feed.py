@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.core.feeds import read_feed
+from app.core.serialization import orm_response
+from app.core.timing import TimedRoute
+from app.db.routing import get_db
+from app.schemas.post import PostSummary
+from app.schemas.user import User
+from utils.deps import get_current_active_user
+
+router = APIRouter(route_class=TimedRoute)
+
+@router.get("/", response_model=List[PostSummary])
+async def read_my_feed(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Posts by the authors and in the tags the current user follows, newest
+    first; pass the `X-Next-Cursor` header as `cursor` for the next page."""
+    posts = await read_feed(db, user_id=current_user.id, limit=limit, cursor=cursor)
+    return orm_response(List[PostSummary], posts)
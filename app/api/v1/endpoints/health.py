@@ -0,0 +1,33 @@
+import time
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.timing import TimedRoute
+from app.db.routing import replicas
+from app.db.session import get_primary_db, pool_status
+
+router = APIRouter(route_class=TimedRoute)
+
+@router.get("/db")
+async def db_health(
+    db: AsyncSession = Depends(get_primary_db),
+):
+    started = time.perf_counter()
+    try:
+        await db.execute(text("SELECT 1"))
+    except SQLAlchemyError as e:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "error", "detail": str(e), "pool": pool_status(),
+                "replicas": replicas.status(),
+            },
+        )
+    return {
+        "status": "ok",
+        "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        "pool": pool_status(),
+        "replicas": replicas.status(),
+    }
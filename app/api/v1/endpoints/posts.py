@@ -1,25 +1,54 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
+from app.core import ndjson
+from app.core.cache import cached_batch, cached_response
+from app.core.config import settings
+from app.core.serialization import dump, orm_response
+from app.core.views import trending_ids
+from app.core.timing import TimedRoute
 from app.crud.post import post
 from app.crud.user import user
-from app.db.session import get_db
-from app.schemas.post import Post, PostCreate, PostUpdate
-from app.core.security import get_current_active_user
+from app.db.routing import get_db
+from app.schemas.post import (
+    Post, PostCreate, PostExport, PostImport, PostImportResult, PostSearchHit, PostSummary,
+    PostUpdate,
+)
+from utils.deps import (
+    batch_ids, count_post_view, get_current_active_superuser, get_current_active_user,
+    post_write_rate_limit,
+)
 from app.schemas.user import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.get("/", response_model=List[Post])
+@router.get("/", response_model=Union[List[PostSummary], List[Post]])
+@cached_response(
+    "post",
+    ttl=settings.CACHE_TTL_POST,
+    params=("skip", "limit", "cursor", "tag_id", "sort", "expand"),
+)
 async def read_posts(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     tag_id: Optional[int] = None,
+    sort: Optional[Literal["comments", "views"]] = None,
+    expand: bool = False,
 ):
-    return await post.get_multi_with_filters(db, skip=skip, limit=limit, tag_id=tag_id)
+    """List post summaries, newest first, by comment count (`sort=comments`) or
+    by views (`sort=views`); `expand=true` returns full posts with comments."""
+    posts = await post.get_multi_with_filters(
+        db, skip=skip, limit=limit, cursor=cursor, tag_id=tag_id, order=sort or "default",
+        load="default" if expand else "summary",
+    )
+    return dump(List[Post] if expand else List[PostSummary], posts)
 
-@router.post("/", response_model=Post)
+@router.post("/", response_model=Post, dependencies=[Depends(post_write_rate_limit)])
 async def create_post(
     *,
     db: AsyncSession = Depends(get_db),
@@ -30,7 +59,86 @@ async def create_post(
         db, obj_in=post_in, author_id=current_user.id, tag_ids=post_in.tag_ids
     )
 
-@router.get("/{post_id}", response_model=Post)
+@router.get("/search", response_model=List[PostSearchHit])
+async def search_posts(
+    q: str = Query(..., min_length=1),
+    db: AsyncSession = Depends(get_db),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+):
+    hits = await post.search(db, q=q, limit=limit, cursor=cursor)
+    return orm_response(List[PostSearchHit], hits)
+
+@router.get("/trending", response_model=List[PostSummary])
+async def read_trending_posts(
+    db: AsyncSession = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Most viewed posts of the last hours, recent views weighing more. Without
+    view data in Redis, the most viewed posts of all time."""
+    ids = await trending_ids(limit)
+    if ids:
+        posts = await post.get_many(db, ids, load="summary")
+    else:
+        posts = list(await post.get_multi_with_filters(
+            db, limit=limit, order="views", load="summary"
+        ))
+    return orm_response(List[PostSummary], posts)
+
+@router.post("/import", response_model=PostImportResult)
+async def import_posts(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+):
+    """Create posts from an NDJSON body, one `PostImport` object per line.
+    The import runs in a single transaction: any invalid line rejects it all."""
+    async def parse_lines():
+        async for number, line in ndjson.iter_lines(request.stream()):
+            try:
+                yield PostImport.parse_raw(line)
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=422,
+                    detail={"line": number, "errors": e.errors()},
+                )
+
+    try:
+        imported = await post.bulk_import(db, objs_in=parse_lines(), author_id=current_user.id)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=422,
+            detail="The import references a user that does not exist.",
+        )
+    return {"imported": imported}
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_posts(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+):
+    """Stream every post as NDJSON (`PostExport` per line, by id), suitable
+    for `POST /posts/import`."""
+    async def lines():
+        async for rows in post.stream_export(db):
+            yield "".join(PostExport.from_orm(row).json() + "\n" for row in rows)
+
+    return StreamingResponse(lines(), media_type=ndjson.MEDIA_TYPE)
+
+@router.get("/batch", response_model=List[Post])
+async def read_posts_batch(
+    request: Request,
+    ids: List[int] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_db),
+):
+    """Posts by id in the order given (`?ids=3,1,2`); unknown ids are left out."""
+    return await cached_batch(
+        request, "post", Post, ids, db=db, ttl=settings.CACHE_TTL_POST,
+        fetch=lambda session, missing: post.get_many_batched(session, missing),
+    )
+
+@router.get("/{post_id}", response_model=Post, dependencies=[Depends(count_post_view)])
+@cached_response("post", Post, ttl=settings.CACHE_TTL_POST, id_param="post_id")
 async def read_post(
     post_id: int,
     db: AsyncSession = Depends(get_db),
@@ -43,7 +151,7 @@ async def read_post(
         )
     return db_post
 
-@router.put("/{post_id}", response_model=Post)
+@router.put("/{post_id}", response_model=Post, dependencies=[Depends(post_write_rate_limit)])
 async def update_post(
     *,
     db: AsyncSession = Depends(get_db),
@@ -64,7 +172,7 @@ async def update_post(
         )
     return await post.update_with_tags(db, db_obj=db_post, obj_in=post_in)
 
-@router.delete("/{post_id}", response_model=Post)
+@router.delete("/{post_id}", response_model=Post, dependencies=[Depends(post_write_rate_limit)])
 async def delete_post(
     *,
     db: AsyncSession = Depends(get_db),
@@ -1,20 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Literal, Optional, Union
+from app.core.autocomplete import tag_index
+from app.core.cache import cached_batch, cached_response
+from app.core.config import settings
+from app.core.serialization import dump, orm_response
+from app.core.timing import TimedRoute
 from app.crud.tag import tag
-from app.db.session import get_db
-from app.schemas.tag import Tag, TagCreate, TagUpdate
-from app.core.security import get_current_active_superuser
+from app.crud.user import user
+from app.db.routing import get_db
+from app.schemas.tag import Tag, TagCreate, TagSummary, TagUpdate
+from app.schemas.user import Follow, User
+from utils.deps import batch_ids, get_current_active_superuser, get_current_active_user
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
-@router.get("/", response_model=List[Tag])
+@router.get("/", response_model=Union[List[TagSummary], List[Tag]])
+@cached_response(
+    "tag", ttl=settings.CACHE_TTL_TAG, params=("skip", "limit", "cursor", "sort", "expand")
+)
 async def read_tags(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    sort: Optional[Literal["posts"]] = None,
+    expand: bool = False,
 ):
-    return await tag.get_multi(db, skip=skip, limit=limit)
+    """List tags with post counts, by id or by post count (`sort=posts`);
+    `expand=true` embeds each tag's post summaries."""
+    tags = await tag.get_multi(
+        db, skip=skip, limit=limit, cursor=cursor, order=sort or "default",
+        load="default" if expand else "summary",
+    )
+    return dump(List[Tag] if expand else List[TagSummary], tags)
 
 @router.post("/", response_model=Tag)
 async def create_tag(
@@ -31,7 +51,34 @@ async def create_tag(
         )
     return await tag.create(db, obj_in=tag_in)
 
+@router.get("/autocomplete", response_model=List[TagSummary])
+async def autocomplete_tags(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_db),
+):
+    """Tags whose name starts with `prefix` (case-insensitive), most used first.
+    Without a prefix match, the closest names by trigram similarity."""
+    if settings.TAG_INDEX_ENABLED and await tag_index.ready():
+        suggestions = tag_index.suggest(prefix, limit)
+        if suggestions:
+            return ORJSONResponse(suggestions)
+    return orm_response(List[TagSummary], await tag.search_similar(db, q=prefix, limit=limit))
+
+@router.get("/batch", response_model=List[Tag])
+async def read_tags_batch(
+    request: Request,
+    ids: List[int] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_db),
+):
+    """Tags by id in the order given (`?ids=3,1,2`); unknown ids are left out."""
+    return await cached_batch(
+        request, "tag", Tag, ids, db=db, ttl=settings.CACHE_TTL_TAG,
+        fetch=lambda session, missing: tag.get_many_batched(session, missing),
+    )
+
 @router.get("/{tag_id}", response_model=Tag)
+@cached_response("tag", Tag, ttl=settings.CACHE_TTL_TAG, id_param="tag_id")
 async def read_tag(
     tag_id: int,
     db: AsyncSession = Depends(get_db),
@@ -74,3 +121,29 @@ async def delete_tag(
             detail="The tag with this id does not exist.",
         )
     return await tag.remove(db, id=tag_id)
+
+@router.post("/{tag_id}/follow", response_model=Follow)
+async def follow_tag(
+    *,
+    db: AsyncSession = Depends(get_db),
+    tag_id: int,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Follow a tag: new posts with it appear in `GET /feed`."""
+    if not await tag.get(db, id=tag_id, load="summary"):
+        raise HTTPException(
+            status_code=404,
+            detail="The tag with this id does not exist.",
+        )
+    await user.follow(db, follower_id=current_user.id, tag_id=tag_id)
+    return Follow(following=True)
+
+@router.delete("/{tag_id}/follow", response_model=Follow)
+async def unfollow_tag(
+    *,
+    db: AsyncSession = Depends(get_db),
+    tag_id: int,
+    current_user: User = Depends(get_current_active_user),
+):
+    await user.unfollow(db, follower_id=current_user.id, tag_id=tag_id)
+    return Follow(following=False)
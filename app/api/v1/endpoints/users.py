@@ -1,22 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+from app.core.serialization import orm_response
+from app.core.timing import TimedRoute
 from app.crud.user import user
-from app.db.session import get_db
-from app.schemas.user import User, UserCreate, UserUpdate
-from app.core.security import get_current_active_superuser, get_current_active_user
+from app.db.routing import get_db
+from app.schemas.user import Follow, User, UserCreate, UserUpdate
+from utils.deps import batch_ids, get_current_active_superuser, get_current_active_user
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/", response_model=List[User])
 async def read_users(
     db: AsyncSession = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_superuser),
 ):
-    users = await user.get_multi(db, skip=skip, limit=limit)
-    return users
+    users = await user.get_multi(db, skip=skip, limit=limit, cursor=cursor)
+    return orm_response(List[User], users)
 
 @router.post("/", response_model=User)
 async def create_user(
@@ -39,6 +42,15 @@ async def read_user_me(
 ):
     return current_user
 
+@router.get("/batch", response_model=List[User])
+async def read_users_batch(
+    ids: List[int] = Depends(batch_ids),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+):
+    """Users by id in the order given (`?ids=3,1,2`); unknown ids are left out."""
+    return orm_response(List[User], await user.get_many_batched(db, ids))
+
 @router.get("/{user_id}", response_model=User)
 async def read_user(
     user_id: int,
@@ -68,3 +80,31 @@ async def update_user(
             detail="The user with this id does not exist.",
         )
     return await user.update(db, db_obj=db_user, obj_in=user_in)
+
+@router.post("/{user_id}/follow", response_model=Follow)
+async def follow_user(
+    *,
+    db: AsyncSession = Depends(get_db),
+    user_id: int,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Follow an author: their new posts appear in `GET /feed`."""
+    if user_id == current_user.id:
+        raise HTTPException(status_code=400, detail="Users cannot follow themselves.")
+    if not await user.get(db, id=user_id):
+        raise HTTPException(
+            status_code=404,
+            detail="The user with this id does not exist.",
+        )
+    await user.follow(db, follower_id=current_user.id, author_id=user_id)
+    return Follow(following=True)
+
+@router.delete("/{user_id}/follow", response_model=Follow)
+async def unfollow_user(
+    *,
+    db: AsyncSession = Depends(get_db),
+    user_id: int,
+    current_user: User = Depends(get_current_active_user),
+):
+    await user.unfollow(db, follower_id=current_user.id, author_id=user_id)
+    return Follow(following=False)
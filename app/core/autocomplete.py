@@ -0,0 +1,142 @@
+"""Tag name autocomplete from a per-worker in-memory index.
+
+Tag names are kept casefolded in a sorted list, so a prefix is a ``bisect``
+range and the suggestions are the most used tags (post_count) within it. The
+index is loaded on first use and rebuilt in the background when any worker
+publishes a tag change on TAGS_CHANNEL, or once it is TAG_INDEX_MAX_AGE old
+(post counts move with every post write and aren't published).
+"""
+import asyncio
+import heapq
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from app.core import cache
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.db.models.tag import Tag
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+TAGS_CHANNEL = "tags:changed"
+# Sorts after every character a name can continue with
+_PREFIX_END = "\U0010ffff"
+
+class TagIndex:
+    def __init__(self):
+        self._keys: List[str] = []
+        self._tags: List[Dict[str, Any]] = []
+        # Suggestions per (prefix, limit); short prefixes match many tags
+        self._memo: Dict[Tuple[str, int], List[Dict[str, Any]]] = {}
+        self.built_at: Optional[float] = None
+        self.dirty = False
+        self._flight = SingleFlight()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, rows: Iterable[Tuple[int, str, int]]) -> None:
+        entries = sorted((name.casefold(), id, name, post_count) for id, name, post_count in rows)
+        self._keys = [key for key, *_ in entries]
+        self._tags = [
+            {"name": name, "id": id, "post_count": post_count} for _, id, name, post_count in entries
+        ]
+        self._memo = {}
+        self.built_at = time.monotonic()
+
+    def suggest(self, prefix: str, limit: int) -> List[Dict[str, Any]]:
+        """Up to ``limit`` tags starting with ``prefix`` (case-insensitive), most
+        used first, then by name."""
+        key = prefix.casefold()
+        memo = self._memo.get((key, limit))
+        if memo is not None:
+            return memo
+        lo = bisect_left(self._keys, key)
+        hi = bisect_left(self._keys, key + _PREFIX_END, lo)
+        positions = heapq.nlargest(
+            limit, range(lo, hi), key=lambda i: (self._tags[i]["post_count"], -i)
+        )
+        suggestions = [self._tags[i] for i in positions]
+        if len(self._memo) >= 10000:
+            self._memo.clear()
+        self._memo[key, limit] = suggestions
+        return suggestions
+
+    async def rebuild(self) -> None:
+        await self._flight.do("rebuild", self._rebuild)
+
+    async def _rebuild(self) -> None:
+        self.dirty = False
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Tag.id, Tag.name, Tag.post_count))
+            rows = result.all()
+        self.load(rows)
+
+    def _refresh_in_background(self) -> None:
+        if self._flight.running("rebuild"):
+            return
+        task = asyncio.ensure_future(self.rebuild())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Tag index rebuild failed", exc_info=task.exception())
+
+    async def ready(self) -> bool:
+        """Load on first use; afterwards serve the current index while a stale
+        or dirty one is rebuilt. False if it can't be loaded."""
+        if self.built_at is None:
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.warning("Tag index build failed", exc_info=True)
+                return False
+            return True
+        if self.dirty or time.monotonic() - self.built_at > settings.TAG_INDEX_MAX_AGE:
+            self._refresh_in_background()
+        return True
+
+    async def listen(self) -> None:
+        """Mark the index dirty on every TAGS_CHANNEL message, reconnecting on errors."""
+        while True:
+            try:
+                pubsub = cache.redis.pubsub()
+                await pubsub.subscribe(TAGS_CHANNEL)
+                if self.built_at is not None:
+                    # Changes may have been missed while reconnecting
+                    self.dirty = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dirty = True
+            except RedisError:
+                logger.warning("Tag index subscription lost, retrying", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def start(self) -> None:
+        if not settings.TAG_INDEX_ENABLED:
+            return
+        self._refresh_in_background()
+        if cache.redis is not None:
+            task = asyncio.create_task(self.listen())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def stop(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+
+tag_index = TagIndex()
+
+async def publish_tags_changed() -> None:
+    tag_index.dirty = True
+    if cache.redis is None:
+        return
+    try:
+        await cache.redis.publish(TAGS_CHANNEL, "1")
+    except RedisError:
+        logger.warning("Could not publish tag change", exc_info=True)
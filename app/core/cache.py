@@ -1,5 +1,47 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import secrets
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple,
+)
+from fastapi import Request, Response
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.conditional import is_not_modified, validator_headers
 from app.core.config import settings
+from app.core.metrics import CACHE_COALESCED, CACHE_COALESCED_WAIT, CACHE_REQUESTS
+from app.core.pagination import pagination_headers
+from app.core.serialization import dump, render
+from app.core.singleflight import NO_LOCK, SingleFlight, acquire_lock, release_lock
+from app.core.timing import redis_call, serializing
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with redis_call():
+            return await super().execute(raise_on_error)
+
+class InstrumentedRedis(Redis):
+    """Client that accounts every round trip to the current request's metrics."""
+
+    async def execute_command(self, *args, **options):
+        with redis_call():
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
 
 redis: Optional[Redis] = None
 
@@ -8,9 +50,418 @@ async def get_redis() -> Redis:
 
 async def init_redis() -> None:
     global redis
-    redis = Redis(
+    redis = InstrumentedRedis(
         host=settings.REDIS_HOST,
         port=settings.REDIS_PORT,
         password=settings.REDIS_PASSWORD,
-        decode_responses=True
     )
+
+async def close_redis() -> None:
+    global redis
+    if redis is not None:
+        await redis.close()
+        redis = None
+
+# Key layout per resource (responses are hashes of body bytes + JSON headers +
+# fresh_until; they live CACHE_STALE_SECONDS past it, see cached_response):
+# Headers include the ETag of the body, so conditional requests
+# are answered from the (small) headers field alone.
+#   cache:<resource>:<id>              detail response
+#   cache:<resource>:list:<params>     list response
+#   cache:<resource>:index             every cached key (for flush)
+#   cache:<resource>:list-index        cached list keys (for invalidate)
+#   cache:<resource>:generation        incremented by invalidate and flush
+# The indexes are sorted sets scored by each key's expiry time: every write
+# drops the members that expired, and an index expires with its last entry.
+# An entry is written only if the generation it was built in is still current,
+# so a build that raced an invalidation doesn't store what it read before it.
+
+def index_key(resource: str) -> str:
+    return f"cache:{resource}:index"
+
+def list_index_key(resource: str) -> str:
+    return f"cache:{resource}:list-index"
+
+def generation_key(resource: str) -> str:
+    return f"cache:{resource}:generation"
+
+def detail_key(resource: str, id: Any) -> str:
+    return f"cache:{resource}:{id}"
+
+def list_key(resource: str, **params: Any) -> str:
+    query = "&".join(f"{name}={params[name]}" for name in sorted(params))
+    return f"cache:{resource}:list:{query}"
+
+class CachedEntry(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+    # Past its TTL but within CACHE_STALE_SECONDS
+    stale: bool = False
+
+def _entry(fields: Dict[bytes, bytes]) -> Optional[CachedEntry]:
+    if not fields:
+        return None
+    fresh_until = float(fields.get(b"fresh_until", "inf"))
+    return CachedEntry(fields[b"body"], json.loads(fields[b"headers"]), fresh_until < time.time())
+
+async def get_cached(key: str) -> Optional[CachedEntry]:
+    if redis is None or not settings.CACHE_ENABLED:
+        return None
+    try:
+        fields = await redis.hgetall(key)
+    except RedisError:
+        logger.warning("Cache read failed for %s", key, exc_info=True)
+        return None
+    return _entry(fields)
+
+async def get_cached_many(keys: Sequence[str]) -> List[Optional[CachedEntry]]:
+    if redis is None or not settings.CACHE_ENABLED or not keys:
+        return [None] * len(keys)
+    try:
+        async with redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            entries = await pipe.execute()
+    except RedisError:
+        logger.warning("Cache read failed for %d keys", len(keys), exc_info=True)
+        return [None] * len(keys)
+    return [_entry(fields) for fields in entries]
+
+async def get_cached_headers(key: str) -> Optional[Dict[str, str]]:
+    if redis is None or not settings.CACHE_ENABLED:
+        return None
+    try:
+        headers = await redis.hget(key, "headers")
+    except RedisError:
+        logger.warning("Cache read failed for %s", key, exc_info=True)
+        return None
+    return None if headers is None else json.loads(headers)
+
+async def get_generation(resource: str) -> Optional[int]:
+    """Generation to build an entry of ``resource`` in; read before the data
+    is. None when unknown, and then the entry isn't stored."""
+    if redis is None or not settings.CACHE_ENABLED:
+        return None
+    try:
+        return int(await redis.get(generation_key(resource)) or 0)
+    except RedisError:
+        logger.warning("Cache generation read failed for %s", resource, exc_info=True)
+        return None
+
+async def set_cached(
+    key: str, resource: str, body: bytes, headers: Dict[str, str], ttl: int, *, is_list: bool,
+    generation: Optional[int]
+) -> None:
+    await set_cached_many(
+        resource, {key: (body, headers)}, ttl, is_list=is_list, generation=generation
+    )
+
+# KEYS: generation, index, list index, entries. ARGV: generation built in, now,
+# fresh_until, lifetime (seconds), "1" when the entries are lists, then body
+# and headers of each entry. Returns 0, writing nothing, if invalidated since
+STORE = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+  return 0
+end
+local now, lifetime = tonumber(ARGV[2]), tonumber(ARGV[4])
+local indexes = {KEYS[2]}
+if ARGV[5] == '1' then indexes[2] = KEYS[3] end
+for i = 4, #KEYS do
+  redis.call('HSET', KEYS[i], 'body', ARGV[2 * i - 2], 'headers', ARGV[2 * i - 1],
+             'fresh_until', ARGV[3], 'generation', ARGV[1])
+  redis.call('EXPIRE', KEYS[i], lifetime)
+  for _, index in ipairs(indexes) do
+    redis.call('ZADD', index, now + lifetime, KEYS[i])
+  end
+end
+for _, index in ipairs(indexes) do
+  redis.call('ZREMRANGEBYSCORE', index, '-inf', now)
+  if redis.call('TTL', index) < lifetime then
+    redis.call('EXPIRE', index, lifetime)
+  end
+end
+return 1
+"""
+
+_store_script: Optional[AsyncScript] = None
+
+def _store() -> AsyncScript:
+    global _store_script
+    if _store_script is None or _store_script.registered_client is not redis:
+        _store_script = redis.register_script(STORE)
+    return _store_script
+
+async def set_cached_many(
+    resource: str, entries: Dict[str, Tuple[bytes, Dict[str, str]]], ttl: int, *, is_list: bool,
+    generation: Optional[int]
+) -> None:
+    if redis is None or not settings.CACHE_ENABLED or not entries or generation is None:
+        return
+    now = time.time()
+    args: List[Any] = [
+        generation, now, now + ttl, ttl + settings.CACHE_STALE_SECONDS, int(is_list)
+    ]
+    for body, headers in entries.values():
+        args += [body, json.dumps(headers)]
+    keys = [generation_key(resource), index_key(resource), list_index_key(resource), *entries]
+    try:
+        await _store()(keys=keys, args=args)
+    except RedisError:
+        logger.warning("Cache write failed for %s", ", ".join(entries), exc_info=True)
+
+# Keys deleted per round trip when dropping an index
+DROP_CHUNK = 500
+
+async def _drop_indexed(index: str) -> None:
+    """Delete every key listed in ``index``, then the index, in chunks."""
+    # Entries cached meanwhile go to a new index, so this ends
+    snapshot = f"{index}:dropping:{secrets.token_hex(4)}"
+    try:
+        await redis.rename(index, snapshot)
+    except ResponseError:
+        # No index: nothing cached
+        return
+    while True:
+        keys = await redis.zrange(snapshot, 0, DROP_CHUNK - 1)
+        if not keys:
+            break
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            pipe.zrem(snapshot, *keys)
+            await pipe.execute()
+    await redis.delete(snapshot)
+
+async def invalidate(resource: str, id: Any = None) -> None:
+    """Drop the detail entry for ``id`` and every list page of ``resource``."""
+    if redis is None:
+        return
+    try:
+        # First: builds in flight can no longer store what they read
+        await redis.incr(generation_key(resource))
+        if id is not None:
+            await redis.delete(detail_key(resource, id))
+        await _drop_indexed(list_index_key(resource))
+    except RedisError:
+        logger.warning("Cache invalidation failed for %s", resource, exc_info=True)
+
+async def flush(resource: str) -> None:
+    """Drop every cached response of ``resource``."""
+    if redis is None:
+        return
+    try:
+        await redis.incr(generation_key(resource))
+        await _drop_indexed(index_key(resource))
+        await redis.delete(list_index_key(resource))
+    except RedisError:
+        logger.warning("Cache flush failed for %s", resource, exc_info=True)
+
+_flights = SingleFlight()
+
+async def rebuild(
+    resource: str, key: str, build: Callable[[], Awaitable[CachedEntry]]
+) -> CachedEntry:
+    """``build()`` for a missing entry, once per key for all concurrent misses
+    of this worker (and of all workers with CACHE_LOCK_ENABLED)."""
+    if _flights.running(key):
+        started = time.perf_counter()
+        try:
+            return await _flights.do(key, build)
+        finally:
+            CACHE_COALESCED.labels(resource, "worker").inc()
+            CACHE_COALESCED_WAIT.labels(resource).observe(time.perf_counter() - started)
+    return await _flights.do(key, functools.partial(_build_locked, resource, key, build))
+
+async def _build_locked(
+    resource: str, key: str, build: Callable[[], Awaitable[CachedEntry]]
+) -> CachedEntry:
+    token = await acquire_lock(redis, key)
+    if token is None:
+        # Another worker is building it: poll for its entry, at most as long as
+        # its lock lives, then build here anyway
+        started = time.perf_counter()
+        deadline = started + settings.CACHE_LOCK_TIMEOUT_MS / 1000
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(0.025)
+            entry = await get_cached(key)
+            if entry is not None and not entry.stale:
+                CACHE_COALESCED.labels(resource, "cluster").inc()
+                CACHE_COALESCED_WAIT.labels(resource).observe(time.perf_counter() - started)
+                return entry
+        token = await acquire_lock(redis, key) or NO_LOCK
+    try:
+        return await build()
+    finally:
+        await release_lock(redis, key, token)
+
+async def revalidate(
+    key: str, stale: CachedEntry, build: Callable[[], Awaitable[CachedEntry]]
+) -> CachedEntry:
+    """Stale-while-revalidate: the first request to see ``stale`` rebuilds it
+    (and gets the new entry); requests arriving meanwhile, here or on a worker
+    holding the lock, get ``stale`` without waiting."""
+    if _flights.running(key):
+        return stale
+
+    async def refresh() -> CachedEntry:
+        token = await acquire_lock(redis, key)
+        if token is None:
+            return stale
+        try:
+            return await build()
+        finally:
+            await release_lock(redis, key, token)
+    return await _flights.do(key, refresh)
+
+def serialize(response_model: Any, content: Any) -> Tuple[bytes, Dict[str, str]]:
+    """JSON body of ``content`` and its validator (ETag) headers."""
+    if response_model is not None:
+        content = dump(response_model, content)
+    with serializing():
+        body = render(content)
+    return body, validator_headers(body)
+
+_REQUEST_PARAM = "cache_request"
+
+# Set on request.state by app.db.routing.get_db: the caller wrote within
+# DB_READ_YOUR_WRITES_SECONDS, or its session is on a read replica
+def reads_own_writes(request: Request) -> bool:
+    return getattr(request.state, "read_your_writes", False)
+
+def on_replica(request: Request) -> bool:
+    return getattr(request.state, "replica", False)
+
+@asynccontextmanager
+async def build_session(
+    request: Request, db: AsyncSession, generation: Optional[int]
+) -> AsyncIterator[AsyncSession]:
+    """Session to build an entry in: the primary instead of a replica when the
+    entry will be stored, as it outlives the replica's lag."""
+    if generation is None or not on_replica(request):
+        yield db
+        return
+    async with AsyncSessionLocal() as primary:
+        yield primary
+
+def cached_response(
+    resource: str,
+    response_model: Any = None,
+    *,
+    ttl: int,
+    id_param: Optional[str] = None,
+    params: Sequence[str] = (),
+) -> Callable:
+    """Read-through cache for GET endpoints.
+
+    The endpoint's result is validated against ``response_model`` (or taken as
+    already validated when it is None, for endpoints whose shape depends on a
+    parameter) and stored as JSON bytes together with its pagination and ETag
+    headers; hits are returned as a raw ``Response`` without
+    touching the database. Conditional requests matching a cached entry get a
+    304 from its headers alone. Exceptions (404 etc.) are never cached.
+
+    A key is rebuilt by one request at a time (see ``rebuild``); during its
+    CACHE_STALE_SECONDS after expiry the old entry is served meanwhile.
+    Entries are built from the primary (``build_session``), and callers who
+    just wrote are answered past the cache (``reads_own_writes``).
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs.pop(_REQUEST_PARAM)
+            if id_param is not None:
+                key = detail_key(resource, kwargs[id_param])
+            else:
+                key = list_key(resource, **{name: kwargs.get(name) for name in params})
+            conditional = (
+                "if-none-match" in request.headers or "if-modified-since" in request.headers
+            )
+            bypass = reads_own_writes(request)
+            if conditional and not bypass:
+                headers = await get_cached_headers(key)
+                if headers is not None and is_not_modified(headers, request.headers):
+                    CACHE_REQUESTS.labels(resource, "hit").inc()
+                    return Response(status_code=304, headers=headers)
+
+            async def build() -> CachedEntry:
+                generation = await get_generation(resource)
+                if "db" in kwargs:
+                    async with build_session(request, kwargs["db"], generation) as db:
+                        content = await endpoint(*args, **{**kwargs, "db": db})
+                else:
+                    content = await endpoint(*args, **kwargs)
+                body, validators = serialize(response_model, content)
+                headers = {**pagination_headers(content), **validators}
+                await set_cached(
+                    key, resource, body, headers, ttl, is_list=id_param is None,
+                    generation=generation,
+                )
+                return CachedEntry(body, headers)
+
+            entry = None if bypass else await get_cached(key)
+            if bypass:
+                # Entries may predate this caller's write: they can't be trusted
+                CACHE_REQUESTS.labels(resource, "bypass").inc()
+                entry = await build()
+            elif entry is None:
+                CACHE_REQUESTS.labels(resource, "miss").inc()
+                entry = await rebuild(resource, key, build)
+            elif entry.stale:
+                CACHE_REQUESTS.labels(resource, "stale").inc()
+                entry = await revalidate(key, entry, build)
+            else:
+                CACHE_REQUESTS.labels(resource, "hit").inc()
+            body, headers, _ = entry
+            if conditional and is_not_modified(headers, request.headers):
+                return Response(status_code=304, headers=headers)
+            return Response(content=body, headers=headers, media_type="application/json")
+
+        # FastAPI reads the signature to inject parameters: add the request
+        signature = inspect.signature(endpoint)
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        ])
+        return wrapper
+    return decorator
+
+async def cached_batch(
+    request: Request,
+    resource: str,
+    response_model: Any,
+    ids: Sequence[Any],
+    *,
+    db: AsyncSession,
+    ttl: int,
+    fetch: Callable[[AsyncSession, List[Any]], Awaitable[Sequence[Any]]],
+) -> Response:
+    """JSON array of the detail responses of ``ids``, in order, unknown ids
+    skipped. Bodies come from the detail cache entries (one pipelined read);
+    the misses are fetched in one call and cached as detail entries, so
+    invalidation needs nothing new."""
+    ids = list(dict.fromkeys(ids))
+    keys = [detail_key(resource, id) for id in ids]
+    if reads_own_writes(request):
+        entries: List[Optional[CachedEntry]] = [None] * len(keys)
+    else:
+        entries = await get_cached_many(keys)
+    missing = [id for id, entry in zip(ids, entries) if entry is None]
+    CACHE_REQUESTS.labels(resource, "hit").inc(len(ids) - len(missing))
+    CACHE_REQUESTS.labels(resource, "miss").inc(len(missing))
+    bodies: Dict[Any, bytes] = {
+        id: entry[0] for id, entry in zip(ids, entries) if entry is not None
+    }
+    if missing:
+        generation = await get_generation(resource)
+        async with build_session(request, db, generation) as session:
+            rows = await fetch(session, missing)
+        fresh = {}
+        for row in rows:
+            body, validators = serialize(response_model, row)
+            bodies[row.id] = body
+            fresh[detail_key(resource, row.id)] = (body, validators)
+        await set_cached_many(resource, fresh, ttl, is_list=False, generation=generation)
+    body = b"[" + b",".join(bodies[id] for id in ids if id in bodies) + b"]"
+    headers = validator_headers(body)
+    if is_not_modified(headers, request.headers):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, headers=headers, media_type="application/json")
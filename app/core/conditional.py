@@ -0,0 +1,33 @@
+import hashlib
+from email.utils import parsedate_to_datetime
+from typing import Mapping
+
+def etag_for(body: bytes) -> str:
+    # Strong validator: equal tags mean byte-identical bodies
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def validator_headers(body: bytes) -> dict:
+    # No Last-Modified: no column moves on every change a response shows
+    # (comment edits, renames of embedded tags and authors, counters), so
+    # If-Modified-Since could be answered 304 for stale content
+    return {"ETag": etag_for(body)}
+
+def is_not_modified(headers: Mapping[str, str], request_headers: Mapping[str, str]) -> bool:
+    """Evaluate If-None-Match, else If-Modified-Since, against response
+    ``headers`` (RFC 7232, GET/HEAD semantics)."""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        etag = headers.get("ETag")
+        if etag is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" matches "x"
+        return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = headers.get("Last-Modified")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
@@ -11,16 +11,124 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str
     POSTGRES_DB: str
     DATABASE_URL: str
+    # Connection pool, per worker process: keep
+    # workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below Postgres max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    DB_ECHO: bool = False
+    # Read replicas: GET requests are served from these (JSON list of URLs),
+    # picked "round_robin" or by "least_connections"; a replica lagging more than
+    # DB_REPLICA_MAX_LAG_SECONDS or failing its health check is skipped, and a
+    # caller who wrote reads from the primary for DB_READ_YOUR_WRITES_SECONDS
+    DATABASE_REPLICA_URLS: List[str] = []
+    DB_REPLICA_SELECTION: str = "round_robin"
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_CHECK_INTERVAL: float = 5.0
+    DB_READ_YOUR_WRITES_SECONDS: float = 10.0
+    # At startup: "verify" the Alembic revision, "create" tables with create_all
+    # (throwaway databases only) or "off"
+    DB_SCHEMA_STARTUP: str = "verify"
+    # GET /tags/autocomplete: per-worker in-memory index of tag names, rebuilt after
+    # tag changes (Redis pub/sub) and at least every TAG_INDEX_MAX_AGE seconds, as
+    # post counts drift; prefixes it can't match fall back to pg_trgm similarity
+    TAG_INDEX_ENABLED: bool = True
+    TAG_INDEX_MAX_AGE: int = 300
+    # Most ids accepted by the /batch endpoints
+    BATCH_MAX_IDS: int = 100
+    # Rows per multi-row INSERT / server-side cursor fetch in bulk import and export
+    DB_BULK_BATCH_SIZE: int = 1000
     
     # Redis
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_PASSWORD: Optional[str] = None
     
+    # Response cache (seconds)
+    CACHE_ENABLED: bool = True
+    CACHE_TTL_POST: int = 60
+    CACHE_TTL_TAG: int = 300
+    CACHE_TTL_COMMENT: int = 30
+    # Expired responses are kept this much longer and served while one request
+    # rebuilds them; concurrent misses of a key wait for a single rebuild per
+    # worker, or per cluster with CACHE_LOCK_ENABLED (Redis lock)
+    CACHE_STALE_SECONDS: int = 30
+    CACHE_LOCK_ENABLED: bool = False
+    CACHE_LOCK_TIMEOUT_MS: int = 5000
+    
+    # Background jobs: a Redis stream consumed by `python -m app.worker` in batches;
+    # failed jobs are retried after JOBS_RETRY_BASE_SECONDS * 2^(attempt-1), then
+    # moved to the dead-letter stream
+    JOBS_ENABLED: bool = True
+    JOBS_STREAM: str = "jobs"
+    JOBS_GROUP: str = "workers"
+    JOBS_STREAM_MAXLEN: int = 100000
+    JOBS_BATCH_SIZE: int = 50
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_RETRY_BASE_SECONDS: float = 10.0
+    JOBS_CLAIM_IDLE_MS: int = 60000
+    
+    # GET /feed: new posts are fanned out by the job worker into per-user Redis
+    # sorted sets of FEED_MAX_LENGTH post ids, kept while read within FEED_TTL
+    # seconds; authors and tags with more than FEED_FANOUT_MAX_FOLLOWERS followers
+    # are skipped on write and merged in from Postgres on read
+    FEED_MAX_LENGTH: int = 800
+    FEED_TTL: int = 7 * 24 * 3600
+    FEED_FANOUT_MAX_FOLLOWERS: int = 10000
+    FEED_FANOUT_BATCH_SIZE: int = 500
+    # View counting: GET /posts/{id} counts in Redis, flushed to the post table by
+    # the job worker every VIEWS_FLUSH_INTERVAL seconds; GET /posts/trending ranks
+    # hourly view buckets of the last TRENDING_WINDOW_HOURS, halving their weight
+    # every TRENDING_HALF_LIFE_HOURS. Unique viewers are a HyperLogLog per post
+    # (up to 12 KB of Redis memory each) dropped VIEWS_UNIQUE_TTL seconds after
+    # the post's last view; a later view starts a new one, and the stored
+    # unique_view_count only grows again once that one exceeds it
+    VIEWS_ENABLED: bool = True
+    VIEWS_FLUSH_INTERVAL: float = 30.0
+    VIEWS_UNIQUE_TTL: int = 7 * 24 * 3600
+    TRENDING_WINDOW_HOURS: int = 48
+    TRENDING_HALF_LIFE_HOURS: float = 6.0
+    TRENDING_MAX_POSTS: int = 1000
+    # Outbound email: "smtp" or "memory" (tests, see utils.send_email.outbox)
+    EMAIL_BACKEND: str = "smtp"
+    EMAILS_FROM: str = "Blog API <noreply@example.com>"
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 1025
+    SMTP_USER: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_TLS: bool = False
+    
     # Auth
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # bcrypt runs off the event loop: "thread" or "process" pool of this many workers
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    # Authenticated users cached per token subject (seconds / entries per worker);
+    # changes are broadcast to every worker over Redis pub/sub
+    PRINCIPAL_CACHE_TTL: int = 60
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_REDIS: bool = False
+    
+    # Rate limits, "<count>/<second|minute|hour|day>" token buckets in Redis:
+    # login per client IP, writes per user (see app.core.ratelimit)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN: str = "10/minute"
+    RATE_LIMIT_POST_WRITE: str = "30/minute"
+    RATE_LIMIT_COMMENT_WRITE: str = "60/minute"
+    
+    # Request instrumentation: Server-Timing header and one log line per request;
+    # requests over the statement budget or SLOW_REQUEST_MS are logged as warnings
+    SERVER_TIMING_ENABLED: bool = True
+    REQUEST_QUERY_BUDGET: int = 10
+    SLOW_REQUEST_MS: float = 500.0
+    
+    # Prometheus metrics at /metrics (see app.core.metrics for multi-process workers)
+    METRICS_ENABLED: bool = True
     
     # CORS
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
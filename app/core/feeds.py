@@ -0,0 +1,183 @@
+"""Personal feeds: posts by followed authors and in followed tags, newest first.
+
+Fan-out on write: for every new post the job worker (``post_created``) adds
+its id to a Redis sorted set per follower, ``feed:<user_id>``, trimmed to
+FEED_MAX_LENGTH, so a feed page is one ``ZREVRANGEBYSCORE`` plus one query
+for the posts. Authors and tags with more than FEED_FANOUT_MAX_FOLLOWERS
+followers are not fanned out; their posts are merged in on read by a single
+indexed query (fan-out on read).
+
+Only existing feeds are written to. A feed is built from Postgres when first
+read, after its owner follows or unfollows someone, and after FEED_TTL of
+not being read. A feed that holds every fanned-out post of its sources is
+marked complete and answers every page, however short; once trimmed, pages
+past its stored length are read from Postgres. Score and member are both the
+post id, which also serves as the cursor.
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core import cache
+from app.core.config import settings
+from app.core.jobs import handler
+from app.core.pagination import Page, decode_cursor, encode_cursor
+from app.core.singleflight import SingleFlight
+from app.crud.post import post
+from app.db.models.post import Post
+from app.db.models.tag import Tag, post_tag, tag_follow
+from app.db.models.user import User, user_follow
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Marks a built feed, so one whose owner follows nothing isn't rebuilt on
+# every read; its score keeps it out of every page and out of trimming
+BUILT = "built"
+# Marks a complete feed: nothing older exists than what it holds. Below every
+# post id, so trimming removes it first and a trimmed feed is incomplete
+END = "end"
+
+# KEYS: feeds, ARGV: post id, FEED_MAX_LENGTH. Skips feeds that aren't built
+PUSH = """
+for _, key in ipairs(KEYS) do
+  if redis.call('EXISTS', key) == 1 then
+    redis.call('ZADD', key, ARGV[1], ARGV[1])
+    redis.call('ZREMRANGEBYRANK', key, 0, -tonumber(ARGV[2]) - 2)
+  end
+end
+return 0
+"""
+
+_script: Optional[AsyncScript] = None
+
+def _push_script() -> AsyncScript:
+    global _script
+    if _script is None or _script.registered_client is not cache.redis:
+        _script = cache.redis.register_script(PUSH)
+    return _script
+
+def feed_key(user_id: int) -> str:
+    return f"feed:{user_id}"
+
+async def invalidate(user_id: int) -> None:
+    """Drop a feed whose sources changed; the next read rebuilds it."""
+    if cache.redis is None:
+        return
+    try:
+        await cache.redis.delete(feed_key(user_id))
+    except RedisError:
+        logger.warning("Could not drop feed of user %s", user_id, exc_info=True)
+
+async def fan_out(post_id: int, user_ids: List[int]) -> None:
+    size = settings.FEED_FANOUT_BATCH_SIZE
+    for start in range(0, len(user_ids), size):
+        keys = [feed_key(user_id) for user_id in user_ids[start:start + size]]
+        await _push_script()(keys=keys, args=[post_id, settings.FEED_MAX_LENGTH])
+
+async def _fan_out_targets(db: AsyncSession, post_id: int) -> List[int]:
+    # Followers of the author and of the post's tags, unless those are popular
+    limit = settings.FEED_FANOUT_MAX_FOLLOWERS
+    of_author = (
+        select(user_follow.c.follower_id)
+        .join(Post, Post.author_id == user_follow.c.author_id)
+        .join(User, User.id == Post.author_id)
+        .where(Post.id == post_id, User.follower_count <= limit)
+    )
+    of_tags = (
+        select(tag_follow.c.user_id)
+        .join(post_tag, post_tag.c.tag_id == tag_follow.c.tag_id)
+        .join(Tag, Tag.id == tag_follow.c.tag_id)
+        .where(post_tag.c.post_id == post_id, Tag.follower_count <= limit)
+    )
+    result = await db.execute(union(of_author, of_tags))
+    return result.scalars().all()
+
+@handler("post_created")
+async def fan_out_posts(payloads: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    if cache.redis is None:
+        return [None] * len(payloads)
+    results: List[Optional[Exception]] = []
+    async with AsyncSessionLocal() as db:
+        for payload in payloads:
+            try:
+                # A deleted post has no targets: nothing to deliver
+                user_ids = await _fan_out_targets(db, payload["post_id"])
+                await fan_out(payload["post_id"], user_ids)
+            except Exception as exc:
+                results.append(exc)
+            else:
+                results.append(None)
+    return results
+
+_rebuilds = SingleFlight()
+
+async def _rebuild(db: AsyncSession, user_id: int) -> None:
+    key = feed_key(user_id)
+    # Created before the query, so posts fanned out while it runs are pushed
+    # into the feed rather than skipped; until the ids land, short pages are
+    # read from Postgres (see read_feed)
+    async with cache.redis.pipeline(transaction=True) as pipe:
+        pipe.zadd(key, {BUILT: float("inf")})
+        pipe.expire(key, settings.FEED_TTL)
+        await pipe.execute()
+    try:
+        ids = await post.get_feed_ids(
+            db, user_id=user_id, fanned_out=True, limit=settings.FEED_MAX_LENGTH
+        )
+    except Exception:
+        await cache.redis.delete(key)
+        raise
+    members = {str(id): id for id in ids}
+    if len(ids) < settings.FEED_MAX_LENGTH:
+        members[END] = 0
+    async with cache.redis.pipeline(transaction=True) as pipe:
+        pipe.zadd(key, members)
+        # Pushes may have added to the rebuilt ids: trim as PUSH does
+        pipe.zremrangebyrank(key, 0, -settings.FEED_MAX_LENGTH - 2)
+        await pipe.execute()
+
+async def _stored_ids(
+    db: AsyncSession, user_id: int, before: Optional[int], limit: int
+) -> Tuple[Optional[List[int]], bool]:
+    """A page of the user's fanned-out feed and whether the feed is complete;
+    None without Redis."""
+    if cache.redis is None:
+        return None, False
+    key = feed_key(user_id)
+    try:
+        if not await cache.redis.exists(key):
+            await _rebuilds.do(key, lambda: _rebuild(db, user_id))
+        async with cache.redis.pipeline(transaction=False) as pipe:
+            pipe.zrevrangebyscore(
+                key, f"({before}" if before is not None else "(+inf", "(0", start=0, num=limit
+            )
+            pipe.zscore(key, END)
+            # Feeds that are read stay
+            pipe.expire(key, settings.FEED_TTL)
+            members, end, _ = await pipe.execute()
+    except RedisError:
+        logger.warning("Feed of user %s read from the database", user_id, exc_info=True)
+        return None, False
+    return [int(member) for member in members], end is not None
+
+async def read_feed(
+    db: AsyncSession, *, user_id: int, limit: int = 20, cursor: Optional[str] = None
+) -> Page:
+    """A page of post summaries (load profile "summary"), newest first."""
+    before = decode_cursor(cursor, [int])[0] if cursor is not None else None
+    ids, complete = await _stored_ids(db, user_id, before, limit)
+    if ids is not None and (complete or len(ids) == limit):
+        popular = await post.get_feed_ids(
+            db, user_id=user_id, fanned_out=False, before=before, limit=limit
+        )
+        ids = sorted({*ids, *popular}, reverse=True)[:limit]
+    else:
+        # Past the end of a trimmed feed, or no Redis: everything from Postgres
+        ids = await post.get_feed_ids(db, user_id=user_id, before=before, limit=limit)
+    posts = await post.get_many(db, ids, load="summary")
+    # Deleted posts are skipped, so the cursor follows the ids, not the rows
+    next_cursor = encode_cursor([ids[-1]]) if len(ids) == limit else None
+    return Page(posts, next_cursor)
@@ -0,0 +1,158 @@
+"""Background jobs on a Redis stream.
+
+Requests only ``enqueue`` (one XADD); ``python -m app.worker`` processes jobs
+in batches as a member of a consumer group, so several workers share the
+stream and a job left pending by a crashed worker is claimed by another one
+after JOBS_CLAIM_IDLE_MS.
+
+Keys:
+    <JOBS_STREAM>          pending jobs: fields kind, payload (JSON), attempts
+    <JOBS_STREAM>:retry    sorted set of failed jobs by due time (backoff)
+    <JOBS_STREAM>:dead     jobs that failed JOBS_MAX_ATTEMPTS times, with the error
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+from app.core import cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# A handler gets every payload of its kind from one batch and returns one
+# result per payload: None on success, the exception otherwise
+Handler = Callable[[List[Dict[str, Any]]], Awaitable[Sequence[Optional[Exception]]]]
+HANDLERS: Dict[str, Handler] = {}
+
+def handler(kind: str) -> Callable[[Handler], Handler]:
+    def register(func: Handler) -> Handler:
+        HANDLERS[kind] = func
+        return func
+    return register
+
+def retry_key() -> str:
+    return f"{settings.JOBS_STREAM}:retry"
+
+def dead_key() -> str:
+    return f"{settings.JOBS_STREAM}:dead"
+
+def retry_delay(attempts: int) -> float:
+    """Seconds before attempt ``attempts + 1``: exponential, capped at an hour."""
+    return min(settings.JOBS_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 3600.0)
+
+async def enqueue(kind: str, **payload: Any) -> None:
+    """Queue a job; failures are logged, never raised into the request."""
+    if cache.redis is None or not settings.JOBS_ENABLED:
+        return
+    try:
+        await cache.redis.xadd(
+            settings.JOBS_STREAM,
+            {"kind": kind, "payload": json.dumps(payload, default=str), "attempts": 0},
+            maxlen=settings.JOBS_STREAM_MAXLEN,
+            approximate=True,
+        )
+    except RedisError:
+        logger.warning("Could not enqueue %s job", kind, exc_info=True)
+
+Entry = Tuple[bytes, Dict[bytes, bytes]]
+
+class Worker:
+    def __init__(self, redis: Redis, consumer: Optional[str] = None):
+        self.redis = redis
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.stopping = False
+
+    async def ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(
+                settings.JOBS_STREAM, settings.JOBS_GROUP, id="0", mkstream=True
+            )
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        logger.info("Worker %s consuming %s", self.consumer, settings.JOBS_STREAM)
+        while not self.stopping:
+            try:
+                await self.promote_due_retries()
+                entries = await self.claim_stale() or await self.read()
+                if entries:
+                    await self.process(entries)
+            except RedisError:
+                logger.exception("Redis error in worker loop")
+                await asyncio.sleep(1)
+
+    async def read(self) -> List[Entry]:
+        response = await self.redis.xreadgroup(
+            settings.JOBS_GROUP, self.consumer, {settings.JOBS_STREAM: ">"},
+            count=settings.JOBS_BATCH_SIZE, block=1000,
+        )
+        return response[0][1] if response else []
+
+    async def claim_stale(self) -> List[Entry]:
+        # Jobs delivered to a consumer that died before acknowledging them
+        _, entries, *_ = await self.redis.xautoclaim(
+            settings.JOBS_STREAM, settings.JOBS_GROUP, self.consumer,
+            min_idle_time=settings.JOBS_CLAIM_IDLE_MS, count=settings.JOBS_BATCH_SIZE,
+        )
+        # Entries deleted meanwhile come back empty (Redis 6.2)
+        return [entry for entry in entries if entry[0] is not None]
+
+    async def promote_due_retries(self) -> None:
+        due = await self.redis.zrangebyscore(
+            retry_key(), "-inf", time.time(), start=0, num=settings.JOBS_BATCH_SIZE
+        )
+        for member in due:
+            # ZREM decides which worker moves the job when several see it due
+            if await self.redis.zrem(retry_key(), member):
+                await self.redis.xadd(
+                    settings.JOBS_STREAM, json.loads(member),
+                    maxlen=settings.JOBS_STREAM_MAXLEN, approximate=True,
+                )
+
+    async def process(self, entries: List[Entry]) -> None:
+        by_kind: Dict[str, List[Tuple[bytes, Dict[str, Any]]]] = {}
+        for entry_id, fields in entries:
+            job = {key.decode(): value.decode() for key, value in fields.items()}
+            by_kind.setdefault(job["kind"], []).append((entry_id, job))
+
+        for kind, jobs in by_kind.items():
+            results = await self.run_handler(kind, [json.loads(job["payload"]) for _, job in jobs])
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for (entry_id, job), error in zip(jobs, results):
+                    if error is not None:
+                        self.fail(pipe, entry_id, job, error)
+                    pipe.xack(settings.JOBS_STREAM, settings.JOBS_GROUP, entry_id)
+                    pipe.xdel(settings.JOBS_STREAM, entry_id)
+                await pipe.execute()
+
+    async def run_handler(
+        self, kind: str, payloads: List[Dict[str, Any]]
+    ) -> Sequence[Optional[Exception]]:
+        func = HANDLERS.get(kind)
+        if func is None:
+            return [LookupError(f"No handler for job kind {kind!r}")] * len(payloads)
+        try:
+            results = await func(payloads)
+        except Exception as exc:
+            logger.exception("%s handler failed for a batch of %d", kind, len(payloads))
+            return [exc] * len(payloads)
+        return results
+
+    def fail(self, pipe, entry_id: bytes, job: Dict[str, Any], error: Exception) -> None:
+        attempts = int(job["attempts"]) + 1
+        # The entry id keeps equal payloads distinct in the retry set
+        job = {**job, "attempts": attempts, "entry_id": entry_id.decode()}
+        if attempts >= settings.JOBS_MAX_ATTEMPTS or job["kind"] not in HANDLERS:
+            logger.error("%s job dead after %d attempts: %r", job["kind"], attempts, error)
+            pipe.xadd(dead_key(), {**job, "error": repr(error), "failed_at": time.time()})
+        else:
+            due = time.time() + retry_delay(attempts)
+            pipe.zadd(retry_key(), {json.dumps(job): due})
@@ -0,0 +1,127 @@
+"""Prometheus metrics served at ``/metrics``.
+
+With several worker processes (``uvicorn --workers``, gunicorn) set the
+``PROMETHEUS_MULTIPROC_DIR`` environment variable to an empty directory shared
+by the workers before they start; every process then writes its samples there
+and a scrape of any worker aggregates all of them.
+"""
+import os
+import time
+from typing import Dict
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    generate_latest, multiprocess,
+)
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.security import hash_queue_depth
+from app.db.session import async_engine
+
+REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status.",
+    ["method", "route", "status"],
+)
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time until the response headers are sent.",
+    ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+# "livesum": across processes, the sum over live workers
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served.",
+    ["method"], multiprocess_mode="livesum",
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Redis-backed cache lookups by cache and result (hit/miss/stale/bypass).",
+    ["cache", "result"],
+)
+CACHE_COALESCED = Counter(
+    "cache_coalesced_waits_total",
+    "Cache misses that waited for another request's rebuild instead of querying, by scope "
+    "(worker: same process, cluster: another worker holding the Redis lock).",
+    ["cache", "scope"],
+)
+CACHE_COALESCED_WAIT = Histogram(
+    "cache_coalesced_wait_seconds", "Time coalesced cache misses waited for the rebuild.",
+    ["cache"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total", "Requests rejected with 429, by rate limit scope.",
+    ["scope"],
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Connections held by the SQLAlchemy pool, by state.",
+    ["state"], multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connection checkouts.")
+DB_POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Checkouts that timed out waiting.")
+DB_POOL_WAIT = Counter("db_pool_wait_seconds_total", "Time spent waiting for a connection.")
+PASSWORD_HASH_QUEUE = Gauge(
+    "password_hash_queue_depth", "bcrypt calls running or queued in the hash executor.",
+    multiprocess_mode="livesum",
+)
+
+# Pool counters are cumulative per process; Prometheus counters are fed the deltas
+_last_pool_counters: Dict[str, float] = {"checkouts": 0, "timeouts": 0, "wait_seconds_total": 0.0}
+
+def refresh_gauges() -> None:
+    """Copy this process's pool and hash executor state into the metrics."""
+    pool = async_engine.pool
+    DB_POOL_CONNECTIONS.labels("checked_out").set(pool.checkedout())
+    DB_POOL_CONNECTIONS.labels("checked_in").set(pool.checkedin())
+    DB_POOL_CONNECTIONS.labels("overflow").set(max(pool.overflow(), 0))
+    for name, counter in (
+        ("checkouts", DB_POOL_CHECKOUTS),
+        ("timeouts", DB_POOL_TIMEOUTS),
+        ("wait_seconds_total", DB_POOL_WAIT),
+    ):
+        value = getattr(pool, name)
+        if value > _last_pool_counters[name]:
+            counter.inc(value - _last_pool_counters[name])
+        _last_pool_counters[name] = value
+    PASSWORD_HASH_QUEUE.set(hash_queue_depth())
+
+def metrics_response() -> Response:
+    refresh_gauges()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+
+class PrometheusMiddleware:
+    """Request count, latency and in-flight gauge labelled by route template
+    (``/api/v1/posts/{post_id}``), never by the raw path."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        started = time.perf_counter()
+        status = 500
+        duration = None
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status, duration
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                duration = time.perf_counter() - started
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.labels(method).inc()
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            REQUESTS_IN_PROGRESS.labels(method).dec()
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUESTS.labels(method, route, status).inc()
+            REQUEST_DURATION.labels(method, route).observe(
+                duration if duration is not None else time.perf_counter() - started
+            )
+            refresh_gauges()
@@ -0,0 +1,17 @@
+from typing import AsyncIterable, AsyncIterator, Tuple
+
+MEDIA_TYPE = "application/x-ndjson"
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Split a streamed body into (line number, line), skipping blank lines."""
+    buffer = b""
+    number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+    if buffer.strip():
+        yield number + 1, buffer
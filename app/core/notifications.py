@@ -0,0 +1,52 @@
+"""Job handlers for user-facing notifications; loaded by ``app.worker``."""
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from app.core.config import settings
+from app.core.jobs import handler
+from app.db.models.comment import Comment
+from app.db.models.post import Post
+from app.db.session import AsyncSessionLocal
+from utils.send_email import build_message, send_emails
+
+@handler("user_created")
+async def welcome_emails(payloads: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    return await send_emails([
+        build_message(
+            payload["email"],
+            f"Welcome to {settings.PROJECT_NAME}",
+            f"Hi {payload.get('full_name') or payload['email']}, your account is ready.",
+        )
+        for payload in payloads
+    ])
+
+@handler("comment_created")
+async def new_comment_emails(payloads: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+    # One query for the whole batch: comment, its author, the post and the post's author
+    ids = [payload["comment_id"] for payload in payloads]
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Comment)
+            .options(joinedload(Comment.author), joinedload(Comment.post).joinedload(Post.author))
+            .filter(Comment.id.in_(ids))
+        )
+        comments = {db_obj.id: db_obj for db_obj in result.scalars()}
+
+    messages, positions = [], []
+    for position, comment_id in enumerate(ids):
+        db_obj = comments.get(comment_id)
+        # Deleted since, or a reply on one's own post: nothing to send
+        if db_obj is None or db_obj.post is None or db_obj.post.author_id == db_obj.author_id:
+            continue
+        commenter = db_obj.author.full_name or db_obj.author.email
+        messages.append(build_message(
+            db_obj.post.author.email,
+            f"New comment on \"{db_obj.post.title}\"",
+            f"{commenter} wrote:\n\n{db_obj.content}",
+        ))
+        positions.append(position)
+
+    results: List[Optional[Exception]] = [None] * len(ids)
+    for position, error in zip(positions, await send_emails(messages)):
+        results[position] = error
+    return results
@@ -0,0 +1,38 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class Page(list):
+    """List of rows plus the opaque cursor of the following page, if any."""
+
+    def __init__(self, items: Sequence[Any] = (), next_cursor: Optional[str] = None):
+        super().__init__(items)
+        self.next_cursor = next_cursor
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(values, types)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+def pagination_headers(content: Any) -> Dict[str, str]:
+    next_cursor = getattr(content, "next_cursor", None)
+    if next_cursor is None:
+        return {}
+    return {NEXT_CURSOR_HEADER: next_cursor}
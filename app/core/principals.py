@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+from redis.exceptions import RedisError
+from app.core import cache
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS
+from app.schemas.user import User
+
+logger = logging.getLogger(__name__)
+
+class PrincipalCache:
+    """Per-worker LRU of authenticated users keyed by token subject.
+
+    Entries expire after ``ttl`` seconds. Invalidations reach the other
+    workers over Redis pub/sub (see ``listen``); without Redis the TTL bounds
+    how long another worker can keep serving a principal invalidated here.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, User]]" = OrderedDict()
+
+    def get(self, subject: str) -> Optional[User]:
+        entry = self._entries.get(subject)
+        if entry is None:
+            return None
+        expires, principal = entry
+        if expires < time.monotonic():
+            del self._entries[subject]
+            return None
+        self._entries.move_to_end(subject)
+        return principal
+
+    def set(self, subject: str, principal: User) -> None:
+        self._entries[subject] = (time.monotonic() + self.ttl, principal)
+        self._entries.move_to_end(subject)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, subject: str) -> None:
+        self._entries.pop(subject, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+principal_cache = PrincipalCache(
+    maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL
+)
+
+# Subjects (JSON list) whose cached principal every worker must drop
+INVALIDATIONS_CHANNEL = "principals:invalidated"
+
+def _redis_key(subject: str) -> str:
+    return f"principal:{subject}"
+
+def _use_redis() -> bool:
+    return settings.PRINCIPAL_CACHE_REDIS and cache.redis is not None
+
+async def get_principal(subject: str) -> Optional[User]:
+    principal = await _get_principal(subject)
+    CACHE_REQUESTS.labels("principal", "miss" if principal is None else "hit").inc()
+    return principal
+
+async def _get_principal(subject: str) -> Optional[User]:
+    principal = principal_cache.get(subject)
+    if principal is not None or not _use_redis():
+        return principal
+    try:
+        raw = await cache.redis.get(_redis_key(subject))
+    except RedisError:
+        logger.warning("Principal cache read failed", exc_info=True)
+        return None
+    if raw is None:
+        return None
+    principal = User.parse_raw(raw)
+    principal_cache.set(subject, principal)
+    return principal
+
+async def store_principal(subject: str, principal: User) -> None:
+    principal_cache.set(subject, principal)
+    if _use_redis():
+        try:
+            await cache.redis.set(
+                _redis_key(subject), principal.json(), ex=settings.PRINCIPAL_CACHE_TTL
+            )
+        except RedisError:
+            logger.warning("Principal cache write failed", exc_info=True)
+
+async def invalidate_principal(*subjects: str) -> None:
+    for subject in subjects:
+        principal_cache.discard(subject)
+    if cache.redis is None:
+        return
+    try:
+        if settings.PRINCIPAL_CACHE_REDIS:
+            await cache.redis.delete(*(_redis_key(subject) for subject in subjects))
+        await cache.redis.publish(INVALIDATIONS_CHANNEL, json.dumps(subjects))
+    except RedisError:
+        logger.warning("Principal cache invalidation failed", exc_info=True)
+
+async def listen() -> None:
+    """Drop the principals other workers invalidate, reconnecting on errors."""
+    while True:
+        try:
+            pubsub = cache.redis.pubsub()
+            await pubsub.subscribe(INVALIDATIONS_CHANNEL)
+            # Invalidations may have been missed while (re)connecting
+            principal_cache.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    for subject in json.loads(message["data"]):
+                        principal_cache.discard(subject)
+        except RedisError:
+            logger.warning("Principal invalidation subscription lost, retrying", exc_info=True)
+            await asyncio.sleep(1)
+
+_tasks: Set[asyncio.Task] = set()
+
+async def start() -> None:
+    if cache.redis is not None:
+        task = asyncio.create_task(listen())
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+
+async def stop() -> None:
+    for task in list(_tasks):
+        task.cancel()
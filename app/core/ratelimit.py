@@ -0,0 +1,103 @@
+"""Token-bucket rate limiting shared by all workers through Redis.
+
+A limit such as ``"5/minute"`` is a bucket of 5 tokens refilled at 5 per
+minute: bursts up to the capacity pass, the sustained rate is bounded. The
+bucket lives in one Redis hash updated by a Lua script, so concurrent requests
+on any worker cannot overdraw it. When Redis is unavailable each worker falls
+back to its own in-process buckets (limits then apply per worker).
+"""
+import logging
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from redis.commands.core import AsyncScript
+from redis.exceptions import RedisError
+from app.core import cache
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# KEYS[1] bucket; ARGV capacity, refill rate (tokens/second), cost.
+# Redis' clock is used so every worker agrees on elapsed time; floats are
+# returned as strings because Lua numbers are truncated to integers otherwise
+TOKEN_BUCKET = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+else
+  retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(retry_after)}
+"""
+
+class Limit(NamedTuple):
+    capacity: int
+    rate: float  # tokens per second
+
+@lru_cache(maxsize=None)
+def parse_limit(value: str) -> Limit:
+    """``"30/minute"`` -> Limit(30, 0.5)."""
+    count, _, period = value.partition("/")
+    if period not in PERIODS or not count.strip().isdigit() or int(count) < 1:
+        raise ValueError(f"Invalid rate limit {value!r}, expected e.g. '30/minute'")
+    return Limit(int(count), int(count) / PERIODS[period])
+
+class LocalBuckets:
+    """In-process token buckets, least recently used dropped beyond ``maxsize``."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        now = time.monotonic()
+        tokens, ts = self._buckets.get(key, (limit.capacity, now))
+        tokens = min(limit.capacity, tokens + (now - ts) * limit.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / limit.rate
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+local_buckets = LocalBuckets()
+_script: Optional[AsyncScript] = None
+
+def _bucket_script() -> AsyncScript:
+    # EVALSHA, loading the script once per client (and again after SCRIPT FLUSH)
+    global _script
+    if _script is None or _script.registered_client is not cache.redis:
+        _script = cache.redis.register_script(TOKEN_BUCKET)
+    return _script
+
+async def take(key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+    """Take ``cost`` tokens from bucket ``key``: (allowed, seconds to wait if not)."""
+    if cache.redis is not None:
+        try:
+            allowed, retry_after = await _bucket_script()(
+                keys=[f"ratelimit:{key}"], args=[limit.capacity, limit.rate, cost]
+            )
+            return bool(allowed), float(retry_after)
+        except RedisError:
+            logger.warning("Rate limiter falling back to local buckets", exc_info=True)
+    return local_buckets.take(key, limit, cost)
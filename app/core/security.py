@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -7,12 +9,53 @@ from app.schemas.token import TokenPayload
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+_hash_executor: Optional[Executor] = None
+# Hash/verify calls submitted and not yet finished (running + queued)
+_hash_queue_depth = 0
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+def get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _hash_executor
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False)
+        _hash_executor = None
+
+def hash_queue_depth() -> int:
+    return _hash_queue_depth
+
+async def _run_in_hash_executor(func: Callable[..., Any], *args: Any) -> Any:
+    # bcrypt takes hundreds of milliseconds; the pool size bounds how many run at
+    # once and the rest wait in the executor queue without blocking the loop
+    global _hash_queue_depth
+    _hash_queue_depth += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_hash_executor(), func, *args)
+    finally:
+        _hash_queue_depth -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hash_executor(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hash_executor(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
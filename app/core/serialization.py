@@ -0,0 +1,80 @@
+"""Response serialization without a second pydantic pass.
+
+Endpoints return ORM rows that the CRUD layer loaded with the right profile,
+so validating them against ``response_model`` (and then again through
+``jsonable_encoder``) only costs CPU. ``dump`` walks the schema's fields once
+per type to build a plain function from row to dict, and ``render`` encodes
+the result with orjson.
+"""
+import functools
+from typing import Any, Callable, Dict, Optional, get_args, get_origin
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON, ModelField
+from app.core.pagination import Page, pagination_headers
+from app.core.timing import serializing
+
+_MISSING = object()
+
+def _read(obj: Any, name: str) -> Any:
+    if isinstance(obj, dict):
+        return obj.get(name, _MISSING)
+    return getattr(obj, name, _MISSING)
+
+def _field_dumper(model: type, field: ModelField) -> Callable[[Any], Any]:
+    if field.class_validators or field.shape not in (SHAPE_SINGLETON, SHAPE_LIST):
+        # Validators may reshape the value (e.g. PostSummary.tags): run pydantic
+        # for this field only
+        def validated(value: Any) -> Any:
+            value, errors = field.validate(value, {}, loc=field.name, cls=model)
+            if errors:
+                raise ValueError(f"{model.__name__}.{field.name}: {errors}")
+            return jsonable_encoder(value)
+        return validated
+    if not (isinstance(field.type_, type) and issubclass(field.type_, BaseModel)):
+        return lambda value: value
+    nested = field.type_
+    if field.shape == SHAPE_LIST:
+        return lambda value: [dumper(nested)(item) for item in value]
+    return lambda value: None if value is None else dumper(nested)(value)
+
+@functools.lru_cache(maxsize=None)
+def dumper(model: type) -> Callable[[Any], Dict[str, Any]]:
+    """Row -> dict function for a pydantic ``model``, built once per model."""
+    fields = [
+        (name, field.alias, field.get_default(), _field_dumper(model, field))
+        for name, field in model.__fields__.items()
+    ]
+
+    def dump_one(obj: Any) -> Dict[str, Any]:
+        data = {}
+        for name, alias, default, dump_value in fields:
+            value = _read(obj, name)
+            data[alias] = default if value is _MISSING else dump_value(value)
+        return data
+    return dump_one
+
+def dump(response_model: Any, content: Any) -> Any:
+    """Convert ``content`` to JSON-ready data shaped like ``response_model``
+    (a schema or ``List[schema]``), keeping a Page's cursor."""
+    with serializing():
+        if get_origin(response_model) is list:
+            (item_model,) = get_args(response_model)
+            dump_one = dumper(item_model)
+            items = [dump_one(item) for item in content]
+            return Page(items, getattr(content, "next_cursor", None))
+        return dumper(response_model)(content)
+
+def render(content: Any) -> bytes:
+    # Subclasses of list (Page) and dict encode as their base type
+    return orjson.dumps(content, default=jsonable_encoder)
+
+def orm_response(
+    response_model: Any, content: Any, headers: Optional[Dict[str, str]] = None
+) -> ORJSONResponse:
+    """Response for ``content`` that FastAPI doesn't validate again; the
+    route's ``response_model`` still documents the shape."""
+    data = dump(response_model, content)
+    return ORJSONResponse(data, headers={**pagination_headers(data), **(headers or {})})
@@ -0,0 +1,83 @@
+"""Single-flight: concurrent callers for one key share one computation.
+
+In-process, ``SingleFlight.do`` runs the first caller's coroutine and makes the
+others await its result. Across workers, ``acquire_lock`` elects one builder
+per key through a Redis ``SET NX`` lock (when CACHE_LOCK_ENABLED).
+"""
+import asyncio
+import logging
+import secrets
+from typing import Any, Awaitable, Callable, Dict, Optional
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+
+    def running(self, key: str) -> bool:
+        return key in self._calls
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of ``fn()``, or of the call already running for ``key``;
+        exceptions are shared the same way."""
+        future = self._calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        # Retrieved even without waiters, so a failure isn't reported as unhandled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+# Returned by acquire_lock when cross-worker locking is off: build without a lock
+NO_LOCK = ""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+def lock_key(key: str) -> str:
+    return f"lock:{key}"
+
+async def acquire_lock(redis: Optional[Redis], key: str) -> Optional[str]:
+    """Token of the lock on ``key``, NO_LOCK when locking is off or Redis is
+    unavailable, None when another worker holds it."""
+    if not settings.CACHE_LOCK_ENABLED or redis is None:
+        return NO_LOCK
+    token = secrets.token_hex(8)
+    try:
+        acquired = await redis.set(
+            lock_key(key), token, nx=True, px=settings.CACHE_LOCK_TIMEOUT_MS
+        )
+    except RedisError:
+        logger.warning("Cache lock failed for %s", key, exc_info=True)
+        return NO_LOCK
+    return token if acquired else None
+
+async def release_lock(redis: Optional[Redis], key: str, token: str) -> None:
+    if token == NO_LOCK or redis is None:
+        return
+    try:
+        # Only our own lock: it may have expired and been taken by another worker
+        await redis.eval(_RELEASE, 1, lock_key(key), token)
+    except RedisError:
+        logger.warning("Cache unlock failed for %s", key, exc_info=True)
@@ -0,0 +1,179 @@
+import asyncio
+import functools
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class RequestMetrics:
+    """Time spent per component while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_seconds = 0.0
+        self.statements = 0
+        self.rows = 0
+        self.redis_seconds = 0.0
+        self.redis_calls = 0
+        self.serialize_seconds = 0.0
+        # Set when the endpoint returns; validation and rendering come after
+        self.handler_done: Optional[float] = None
+        self.response_started: Optional[float] = None
+
+    @property
+    def total_seconds(self) -> float:
+        return (self.response_started or time.perf_counter()) - self.started
+
+    @property
+    def over_budget(self) -> bool:
+        return self.statements > settings.REQUEST_QUERY_BUDGET
+
+    def server_timing(self) -> str:
+        app_seconds = (
+            self.total_seconds - self.db_seconds - self.redis_seconds - self.serialize_seconds
+        )
+        return ", ".join([
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.statements} queries, {self.rows} rows"',
+            f'redis;dur={self.redis_seconds * 1000:.2f};desc="{self.redis_calls} calls"',
+            f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+            f"app;dur={max(app_seconds, 0) * 1000:.2f}",
+            f"total;dur={self.total_seconds * 1000:.2f}",
+        ])
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+def instrument_engine(engine: Engine) -> None:
+    """Account every statement run on ``engine`` to the current request."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.db_seconds += time.perf_counter() - started
+            metrics.statements += 1
+            # Rows fetched for SELECT, affected for DML; -1 for server-side cursors
+            metrics.rows += max(cursor.rowcount, 0)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            stack: List[float] = context.connection.info.get("query_started", [])
+            if stack:
+                stack.pop()
+
+@contextmanager
+def redis_call() -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.redis_seconds += time.perf_counter() - started
+            metrics.redis_calls += 1
+
+@contextmanager
+def serializing() -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.serialize_seconds += time.perf_counter() - started
+
+def _mark_handler_done() -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.handler_done = time.perf_counter()
+
+class TimedRoute(APIRoute):
+    """Route that records when its endpoint returns, so response validation
+    and rendering by FastAPI can be told apart from the endpoint itself."""
+
+    def get_route_handler(self) -> Callable:
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            async def timed_call(*args: Any, **kwargs: Any) -> Any:
+                result = await call(*args, **kwargs)
+                _mark_handler_done()
+                return result
+        else:
+            def timed_call(*args: Any, **kwargs: Any) -> Any:
+                result = call(*args, **kwargs)
+                _mark_handler_done()
+                return result
+        self.dependant.call = functools.wraps(call)(timed_call)
+        return super().get_route_handler()
+
+def route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or scope["path"]
+
+def log_request(scope: Scope, status: int, metrics: RequestMetrics) -> None:
+    record: Dict[str, Any] = {
+        "method": scope["method"],
+        "route": route_template(scope),
+        "status": status,
+        "total_ms": round(metrics.total_seconds * 1000, 2),
+        "db_ms": round(metrics.db_seconds * 1000, 2),
+        "statements": metrics.statements,
+        "rows": metrics.rows,
+        "redis_ms": round(metrics.redis_seconds * 1000, 2),
+        "redis_calls": metrics.redis_calls,
+        "serialize_ms": round(metrics.serialize_seconds * 1000, 2),
+    }
+    level = logging.INFO
+    if metrics.over_budget:
+        record["over_query_budget"] = True
+        level = logging.WARNING
+    if record["total_ms"] > settings.SLOW_REQUEST_MS:
+        record["slow"] = True
+        level = logging.WARNING
+    logger.log(level, json.dumps(record))
+
+class ServerTimingMiddleware:
+    """Collects RequestMetrics for each HTTP request, sends them as a
+    ``Server-Timing`` header and logs them as one JSON line."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        status = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                metrics.response_started = time.perf_counter()
+                if metrics.handler_done is not None:
+                    metrics.serialize_seconds += metrics.response_started - metrics.handler_done
+                if settings.SERVER_TIMING_ENABLED:
+                    MutableHeaders(scope=message).append("Server-Timing", metrics.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            log_request(scope, status, metrics)
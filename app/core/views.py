@@ -0,0 +1,110 @@
+"""Post view counting and trending posts, written behind through Redis.
+
+``record`` costs one pipelined Redis round trip per ``GET /posts/{id}``, made
+after the response is sent: it adds to the post's pending view count, to its
+HyperLogLog of viewers (user or client IP) and to the current hour's trending
+bucket. ``flush`` (run by ``app.worker`` every VIEWS_FLUSH_INTERVAL seconds)
+moves pending counts to post.view_count / unique_view_count in one batched
+UPDATE, and ``refresh_trending`` sums the last TRENDING_WINDOW_HOURS buckets
+into TRENDING_KEY, each weighted by half every TRENDING_HALF_LIFE_HOURS.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List
+from redis.exceptions import RedisError, ResponseError
+from app.core import cache
+from app.core.config import settings
+from app.crud.post import post
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "views:pending"
+# Pending counts being written to Postgres; kept until they are, so a failed
+# flush is retried with the same counts
+FLUSHING_KEY = "views:flushing"
+FLUSH_LOCK_KEY = "views:flush:lock"
+TRENDING_KEY = "trending"
+
+def unique_key(post_id: int) -> str:
+    return f"views:unique:{post_id}"
+
+def bucket_key(hour: int) -> str:
+    return f"trending:{hour}"
+
+async def record(post_id: int, viewer: str) -> None:
+    if not settings.VIEWS_ENABLED or cache.redis is None:
+        return
+    bucket = bucket_key(int(time.time() // 3600))
+    try:
+        async with cache.redis.pipeline(transaction=False) as pipe:
+            pipe.hincrby(PENDING_KEY, post_id, 1)
+            pipe.pfadd(unique_key(post_id), viewer)
+            # Bounded: only posts viewed within VIEWS_UNIQUE_TTL keep one
+            pipe.expire(unique_key(post_id), settings.VIEWS_UNIQUE_TTL)
+            pipe.zincrby(bucket, 1, post_id)
+            pipe.expire(bucket, (settings.TRENDING_WINDOW_HOURS + 1) * 3600)
+            await pipe.execute()
+    except RedisError:
+        logger.warning("Could not record view of post %s", post_id, exc_info=True)
+
+async def flush() -> int:
+    """Write pending view counts to Postgres; returns how many posts changed."""
+    redis = cache.redis
+    if not await redis.exists(FLUSHING_KEY):
+        try:
+            await redis.rename(PENDING_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # No pending views
+            return 0
+    pending = await redis.hgetall(FLUSHING_KEY)
+    ids = [int(id) for id in pending]
+    async with redis.pipeline(transaction=False) as pipe:
+        for id in ids:
+            pipe.pfcount(unique_key(id))
+        uniques = await pipe.execute()
+    rows: List[Dict[str, int]] = [
+        {"post_id": id, "views": int(pending[key]), "unique_views": unique}
+        for id, key, unique in zip(ids, pending, uniques)
+    ]
+    async with AsyncSessionLocal() as db:
+        await post.add_views(db, rows)
+    # A failure between the commit and this DEL counts the batch twice
+    await redis.delete(FLUSHING_KEY)
+    return len(rows)
+
+async def refresh_trending() -> None:
+    hour = int(time.time() // 3600)
+    half_life = settings.TRENDING_HALF_LIFE_HOURS
+    weights = {
+        bucket_key(hour - age): 0.5 ** (age / half_life)
+        for age in range(settings.TRENDING_WINDOW_HOURS)
+    }
+    async with cache.redis.pipeline(transaction=True) as pipe:
+        pipe.zunionstore(TRENDING_KEY, weights)
+        pipe.zremrangebyrank(TRENDING_KEY, 0, -settings.TRENDING_MAX_POSTS - 1)
+        await pipe.execute()
+
+async def trending_ids(limit: int) -> List[int]:
+    """Ids of the ``limit`` hottest posts; empty when unknown (no Redis)."""
+    if cache.redis is None:
+        return []
+    try:
+        members = await cache.redis.zrevrange(TRENDING_KEY, 0, limit - 1)
+    except RedisError:
+        logger.warning("Could not read trending posts", exc_info=True)
+        return []
+    return [int(member) for member in members]
+
+async def flush_forever() -> None:
+    interval = settings.VIEWS_FLUSH_INTERVAL
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # One flush per interval across all workers
+            if await cache.redis.set(FLUSH_LOCK_KEY, 1, nx=True, px=int(interval * 1000)):
+                await flush()
+                await refresh_trending()
+        except Exception:
+            logger.warning("View flush failed, retrying next interval", exc_info=True)
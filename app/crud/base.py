@@ -1,35 +1,135 @@
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+from typing import (
+    Any, Dict, Generic, Hashable, List, Optional, Sequence, Tuple, Type, TypeVar, Union,
+)
+from sqlalchemy import inspect, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.sql import Select
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from app.core import cache
+from app.core.pagination import Page, decode_cursor, encode_cursor
+from app.crud.loader import loader_for
 from app.db.base_class import Base
 
 ModelType = TypeVar("ModelType", bound=Base)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+def ordered(rows: List[Any], ids: List[Hashable]) -> List[Any]:
+    """``rows`` in the order of ``ids``, skipping ids without a row."""
+    by_id = {row.id: row for row in rows}
+    return [by_id[id] for id in dict.fromkeys(ids) if id in by_id]
+
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
+    # Loader options per response shape, e.g. {"default": (selectinload(Post.tags),)}.
+    # "default" must cover every relationship the matching response_model serializes,
+    # since lazy loads are not possible under AsyncSession.
+    load_profiles: Dict[str, Sequence[Any]] = {}
+    # Response cache namespace (see app.core.cache); None disables invalidation
+    cache_resource: Optional[str] = None
+    # Keyset orderings of list queries by name: (columns, descending).
+    # The last column must be unique; "default" is used unless asked otherwise.
+    orderings: Dict[str, Tuple[Sequence[str], bool]] = {"default": (("id",), False)}
+
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
-    async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
-        result = await db.execute(select(self.model).filter(self.model.id == id))
+    def with_profile(self, query: Select, load: Optional[str] = "default") -> Select:
+        if load is None:
+            return query
+        return query.options(*self.load_profiles.get(load, ()))
+
+    async def get(
+        self, db: AsyncSession, id: Any, *, load: Optional[str] = "default"
+    ) -> Optional[ModelType]:
+        query = self.with_profile(select(self.model).filter(self.model.id == id), load)
+        result = await db.execute(query)
         return result.scalars().first()
 
-    async def get_multi(
-        self, db: AsyncSession, *, skip: int = 0, limit: int = 100
+    async def get_many(
+        self, db: AsyncSession, ids: Sequence[Any], *, load: Optional[str] = "default"
     ) -> List[ModelType]:
-        result = await db.execute(select(self.model).offset(skip).limit(limit))
-        return result.scalars().all()
+        """Rows for ``ids`` in one query, in the order asked; unknown ids are skipped."""
+        ids = list(ids)
+        if not ids:
+            return []
+        query = self.with_profile(select(self.model).filter(self.model.id.in_(ids)), load)
+        result = await db.execute(query)
+        return ordered(result.scalars().unique().all(), ids)
+
+    async def get_batched(
+        self, db: AsyncSession, id: Any, *, load: Optional[str] = "default"
+    ) -> Optional[ModelType]:
+        """``get`` whose concurrent calls on one session share a query (see app.crud.loader)."""
+        return await loader_for(db).load(self, id, load=load)
+
+    async def get_many_batched(
+        self, db: AsyncSession, ids: Sequence[Any], *, load: Optional[str] = "default"
+    ) -> List[ModelType]:
+        """``get_many`` through the session's loader, so rows already loaded
+        by it are not queried again."""
+        return await loader_for(db).load_many(self, ids, load=load)
+
+    def paginate(
+        self, query: Select, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+        order: str = "default"
+    ) -> Select:
+        # With a cursor, seek past the last row of the previous page instead of
+        # scanning and discarding `skip` rows
+        names, descending = self.orderings[order]
+        columns = [getattr(self.model, name) for name in names]
+        if cursor is not None:
+            values = decode_cursor(cursor, [c.type.python_type for c in columns])
+            if descending:
+                query = query.filter(tuple_(*columns) < tuple_(*values))
+            else:
+                query = query.filter(tuple_(*columns) > tuple_(*values))
+        else:
+            query = query.offset(skip)
+        if descending:
+            columns = [c.desc() for c in columns]
+        return query.order_by(*columns).limit(limit)
+
+    async def fetch_page(
+        self, db: AsyncSession, query: Select, *, limit: int, order: str = "default"
+    ) -> Page:
+        result = await db.execute(query)
+        items = result.scalars().all()
+        next_cursor = None
+        if items and len(items) == limit:
+            names, _ = self.orderings[order]
+            next_cursor = encode_cursor([getattr(items[-1], name) for name in names])
+        return Page(items, next_cursor)
+
+    async def get_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+        order: str = "default", load: Optional[str] = "default"
+    ) -> Page:
+        query = self.with_profile(select(self.model), load)
+        query = self.paginate(query, skip=skip, limit=limit, cursor=cursor, order=order)
+        return await self.fetch_page(db, query, limit=limit, order=order)
+
+    async def reload(
+        self, db: AsyncSession, db_obj: ModelType, *, load: Optional[str] = "default"
+    ) -> ModelType:
+        # refresh() only reloads columns; re-select to populate the profile's relationships
+        query = self.with_profile(select(self.model).filter(self.model.id == db_obj.id), load)
+        result = await db.execute(query.execution_options(populate_existing=True))
+        return result.scalars().one()
+
+    async def invalidate_cache(self, db_obj: ModelType) -> None:
+        # Extended by subclasses whose rows are embedded in other resources' responses
+        if self.cache_resource is not None:
+            await cache.invalidate(self.cache_resource, db_obj.id)
 
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)
         db.add(db_obj)
         await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        await self.invalidate_cache(db_obj)
+        return await self.reload(db, db_obj)
 
     async def update(
         self,
@@ -38,7 +138,8 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         db_obj: ModelType,
         obj_in: Union[UpdateSchemaType, Dict[str, Any]]
     ) -> ModelType:
-        obj_data = jsonable_encoder(db_obj)
+        # Column keys only: eager-loaded relationships must not be walked by the encoder
+        obj_data = inspect(db_obj).mapper.column_attrs.keys()
         if isinstance(obj_in, dict):
             update_data = obj_in
         else:
@@ -48,12 +149,12 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
                 setattr(db_obj, field, update_data[field])
         db.add(db_obj)
         await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        await self.invalidate_cache(db_obj)
+        return await self.reload(db, db_obj)
 
     async def remove(self, db: AsyncSession, *, id: int) -> ModelType:
-        obj = await db.execute(select(self.model).filter(self.model.id == id))
-        obj = obj.scalars().first()
+        obj = await self.get(db, id=id)
         await db.delete(obj)
         await db.commit()
+        await self.invalidate_cache(obj)
         return obj
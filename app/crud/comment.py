@@ -1,20 +1,141 @@
-from typing import List
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.sql.elements import ColumnElement
+from sqlalchemy.orm import joinedload
+from app.core import cache, jobs
+from app.core.pagination import Page, decode_cursor, encode_cursor
 from app.crud.base import CRUDBase
-from app.db.models.comment import Comment
+from app.db.models.comment import Comment, PATH_END, make_path
+from app.db.models.post import Post
+from app.db.models.tag import post_tag
 from app.schemas.comment import CommentCreate, CommentUpdate
 
 class CRUDComment(CRUDBase[Comment, CommentCreate, CommentUpdate]):
-    async def get_multi_by_post(
-        self, db: AsyncSession, *, post_id: int, skip: int = 0, limit: int = 100
-    ) -> List[Comment]:
+    load_profiles = {
+        # schemas.comment.Comment
+        "default": (joinedload(Comment.author),),
+    }
+    cache_resource = "comment"
+    orderings = {
+        "default": (("created_at", "id"), False),
+        # Depth-first thread order
+        "thread": (("path",), False),
+    }
+
+    async def invalidate_cache(self, db_obj: Comment) -> None:
+        await super().invalidate_cache(db_obj)
+        # schemas.post.Post embeds comments; summaries carry comment counts
+        await cache.invalidate("post", db_obj.post_id)
+
+    async def _invalidate_tags_of(self, db: AsyncSession, post_id: int) -> None:
+        # schemas.tag.Tag embeds post summaries, whose comment counts changed:
+        # only the post's own tags (and tag lists) are affected
+        if cache.redis is None:
+            return
+        result = await db.execute(select(post_tag.c.tag_id).where(post_tag.c.post_id == post_id))
+        for tag_id in result.scalars().all():
+            await cache.invalidate("tag", tag_id)
+
+    async def _add_to_comment_count(self, db: AsyncSession, post_id: int, delta: int) -> None:
+        # In-place increment in the same transaction as the comment write; updated_at
+        # is kept because a new comment is not an edit of the post
+        await db.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(comment_count=Post.comment_count + delta, updated_at=Post.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+
+    def in_subtree(self, db_obj: Comment) -> ColumnElement:
+        # The comment and all replies below it: one range of (post_id, path)
+        return and_(
+            self.model.post_id == db_obj.post_id,
+            self.model.path >= db_obj.path,
+            self.model.path < db_obj.path + PATH_END,
+        )
+
+    async def create(
+        self, db: AsyncSession, *, obj_in: CommentCreate, post_id: int, author_id: int,
+        parent: Optional[Comment] = None
+    ) -> Comment:
+        # The path ends with the comment's own id, so take it from the sequence
+        # rather than inserting and then updating the row
+        sequence = func.pg_get_serial_sequence(self.model.__tablename__, "id")
+        id = await db.scalar(select(func.nextval(sequence)))
+        db_obj = Comment(
+            id=id,
+            content=obj_in.content,
+            post_id=post_id,
+            author_id=author_id,
+            parent_id=parent.id if parent is not None else None,
+            path=make_path(parent.path if parent is not None else None, id),
+        )
+        db.add(db_obj)
+        await self._add_to_comment_count(db, post_id, 1)
+        await db.commit()
+        await self.invalidate_cache(db_obj)
+        await self._invalidate_tags_of(db, post_id)
+        await jobs.enqueue("comment_created", comment_id=db_obj.id)
+        return await self.reload(db, db_obj)
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Comment:
+        # Replies are removed with the comment, in one statement
+        obj = await self.get(db, id=id)
         result = await db.execute(
-            select(self.model)
-            .filter(self.model.post_id == post_id)
-            .offset(skip)
-            .limit(limit)
+            delete(self.model)
+            .where(self.in_subtree(obj))
+            .execution_options(synchronize_session=False)
+        )
+        await self._add_to_comment_count(db, obj.post_id, -result.rowcount)
+        await db.commit()
+        await self.invalidate_cache(obj)
+        await self._invalidate_tags_of(db, obj.post_id)
+        if result.rowcount > 1:
+            await cache.flush("comment")
+        return obj
+
+    async def get_multi_by_post(
+        self, db: AsyncSession, *, post_id: int, skip: int = 0, limit: int = 100,
+        cursor: Optional[str] = None, load: Optional[str] = "default"
+    ) -> Page:
+        query = self.with_profile(select(self.model), load)
+        query = query.filter(self.model.post_id == post_id)
+        query = self.paginate(query, skip=skip, limit=limit, cursor=cursor)
+        return await self.fetch_page(db, query, limit=limit)
+
+    async def get_threads(
+        self, db: AsyncSession, *, post_id: int, limit: int = 20,
+        cursor: Optional[str] = None, load: Optional[str] = "default"
+    ) -> Page:
+        """``limit`` top-level comments of a post, each followed by all its
+        replies in thread order, in one query; paginated by top-level comment."""
+        top_level = select(self.model.path).where(
+            self.model.post_id == post_id, self.model.parent_id.is_(None)
         )
-        return result.scalars().all()
+        if cursor is not None:
+            (last_path,) = decode_cursor(cursor, [str])
+            top_level = top_level.where(self.model.path > last_path)
+        top_level = top_level.order_by(self.model.path).limit(limit).subquery()
+        # From the first top-level comment to the end of the last one's subtree
+        query = self.with_profile(select(self.model), load).where(
+            self.model.post_id == post_id,
+            self.model.path >= select(func.min(top_level.c.path)).scalar_subquery(),
+            self.model.path < select(func.max(top_level.c.path)).scalar_subquery() + PATH_END,
+        )
+        result = await db.execute(query.order_by(self.model.path))
+        items = result.scalars().all()
+        roots = [item for item in items if item.parent_id is None]
+        next_cursor = encode_cursor([roots[-1].path]) if len(roots) == limit else None
+        return Page(items, next_cursor)
+
+    async def get_subtree(
+        self, db: AsyncSession, *, db_obj: Comment, limit: int = 100,
+        cursor: Optional[str] = None, load: Optional[str] = "default"
+    ) -> Page:
+        """The comment and its replies at any depth, in thread order."""
+        query = self.with_profile(select(self.model), load).where(self.in_subtree(db_obj))
+        query = self.paginate(query, limit=limit, cursor=cursor, order="thread")
+        return await self.fetch_page(db, query, limit=limit, order="thread")
 
 comment = CRUDComment(Comment)
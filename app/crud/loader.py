@@ -0,0 +1,78 @@
+"""Per-session coalescing of primary-key lookups (the DataLoader pattern).
+
+An AsyncSession runs one statement at a time, so code that resolves several
+ids concurrently (``asyncio.gather`` over ``crud.get_batched``) would otherwise
+serialize one query per id. Lookups issued in the same event loop tick are
+collected per CRUD object and load profile and answered by a single
+``WHERE id IN (...)``. Results are memoized until the session commits or
+rolls back; a session from ``get_db`` lasts one request.
+"""
+import asyncio
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+BatchKey = Tuple[Any, Optional[str]]  # (CRUD object, load profile)
+
+class Loader:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self._results: Dict[Tuple[BatchKey, Hashable], Any] = {}
+        self._pending: Dict[BatchKey, Dict[Hashable, asyncio.Future]] = {}
+        # Batches of different CRUD objects still share the session
+        self._lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        # Written rows may have changed: later lookups query again
+        event.listen(db.sync_session, "after_commit", self._forget)
+        event.listen(db.sync_session, "after_rollback", self._forget)
+
+    def _forget(self, session: Any) -> None:
+        self._results.clear()
+
+    async def load(self, crud: Any, id: Hashable, *, load: Optional[str] = "default") -> Any:
+        key = (crud, load)
+        if (key, id) in self._results:
+            return self._results[key, id]
+        pending = self._pending.setdefault(key, {})
+        if id not in pending:
+            loop = asyncio.get_running_loop()
+            pending[id] = loop.create_future()
+            if len(pending) == 1:
+                # Runs after every coroutine already scheduled for this tick
+                loop.call_soon(self._start_dispatch, key)
+        return await pending[id]
+
+    async def load_many(
+        self, crud: Any, ids: Sequence[Hashable], *, load: Optional[str] = "default"
+    ) -> List[Any]:
+        """Rows for ``ids`` in the order asked; unknown ids are skipped."""
+        ids = list(dict.fromkeys(ids))
+        rows = await asyncio.gather(*(self.load(crud, id, load=load) for id in ids))
+        return [row for row in rows if row is not None]
+
+    def _start_dispatch(self, key: BatchKey) -> None:
+        task = asyncio.ensure_future(self._dispatch(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, key: BatchKey) -> None:
+        pending = self._pending.pop(key)
+        crud, load = key
+        try:
+            async with self._lock:
+                rows = await crud.get_many(self.db, list(pending), load=load)
+        except Exception as exc:
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        found = {row.id: row for row in rows}
+        for id, future in pending.items():
+            self._results[key, id] = found.get(id)
+            if not future.done():
+                future.set_result(found.get(id))
+
+def loader_for(db: AsyncSession) -> Loader:
+    if "loader" not in db.info:
+        db.info["loader"] = Loader(db)
+    return db.info["loader"]
@@ -1,38 +1,89 @@
-from typing import List, Optional
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, List, Optional, Sequence
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import (
+    Float, bindparam, cast, insert, literal_column, or_, select, func, true, tuple_, update,
+)
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from app.core import cache, jobs
+from app.core.autocomplete import publish_tags_changed
+from app.core.config import settings
+from app.core.pagination import Page, decode_cursor, encode_cursor
 from app.crud.base import CRUDBase
-from app.db.models.post import Post, post_tag
-from app.db.models.tag import Tag
-from app.schemas.post import PostCreate, PostUpdate
+from app.db.models.comment import Comment
+from app.db.models.post import Post, SEARCH_CONFIG
+from app.db.models.tag import Tag, post_tag, tag_follow
+from app.db.models.user import User, user_follow
+from app.schemas.post import PostCreate, PostImport, PostUpdate
 
 class CRUDPost(CRUDBase[Post, PostCreate, PostUpdate]):
+    load_profiles = {
+        # schemas.post.Post
+        "default": (
+            joinedload(Post.author),
+            selectinload(Post.comments).joinedload(Comment.author),
+            selectinload(Post.tags),
+        ),
+        # schemas.post.PostSummary
+        "summary": (
+            joinedload(Post.author),
+            selectinload(Post.tags),
+        ),
+    }
+    cache_resource = "post"
+    orderings = {
+        "default": (("created_at", "id"), True),
+        "comments": (("comment_count", "id"), True),
+        "views": (("view_count", "id"), True),
+    }
+
+    async def invalidate_cache(self, db_obj: Post) -> None:
+        await super().invalidate_cache(db_obj)
+        # schemas.tag.Tag embeds posts
+        await cache.flush("tag")
+
     async def get_multi_by_author(
-        self, db: AsyncSession, *, author_id: int, skip: int = 0, limit: int = 100
-    ) -> List[Post]:
-        result = await db.execute(
-            select(self.model)
-            .filter(self.model.author_id == author_id)
-            .offset(skip)
-            .limit(limit)
-        )
-        return result.scalars().all()
+        self, db: AsyncSession, *, author_id: int, skip: int = 0, limit: int = 100,
+        cursor: Optional[str] = None, load: Optional[str] = "default"
+    ) -> Page:
+        query = self.with_profile(select(self.model), load)
+        query = query.filter(self.model.author_id == author_id)
+        query = self.paginate(query, skip=skip, limit=limit, cursor=cursor)
+        return await self.fetch_page(db, query, limit=limit)
+
+    async def _add_to_post_counts(self, db: AsyncSession, tag_ids: List[int], delta: int) -> None:
+        # In-place increment: row-locked until commit, so concurrent writers don't lose updates
+        if tag_ids:
+            await db.execute(
+                update(Tag)
+                .where(Tag.id.in_(tag_ids))
+                .values(post_count=Tag.post_count + delta)
+                .execution_options(synchronize_session=False)
+            )
 
     async def create_with_tags(
         self, db: AsyncSession, *, obj_in: PostCreate, author_id: int, tag_ids: List[int] = None
     ) -> Post:
+        tags = []
+        if tag_ids:
+            result = await db.execute(select(Tag).filter(Tag.id.in_(tag_ids)))
+            tags = result.scalars().all()
         db_obj = Post(
             title=obj_in.title,
             content=obj_in.content,
             author_id=author_id,
+            tags=tags,
         )
-        if tag_ids:
-            tags = await db.execute(select(Tag).filter(Tag.id.in_(tag_ids)))
-            db_obj.tags.extend(tags.scalars().all())
         db.add(db_obj)
+        await self._add_to_post_counts(db, [t.id for t in tags], 1)
         await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
+        await self.invalidate_cache(db_obj)
+        # Delivered to followers' feeds by the worker (app.core.feeds)
+        await jobs.enqueue("post_created", post_id=db_obj.id)
+        return await self.reload(db, db_obj)
 
     async def update_with_tags(
         self, db: AsyncSession, *, db_obj: Post, obj_in: PostUpdate
@@ -44,24 +95,242 @@ class CRUDPost(CRUDBase[Post, PostCreate, PostUpdate]):
         
         if "tag_ids" in update_data:
             tag_ids = update_data.pop("tag_ids")
-            # Clear existing tags
-            await db.execute(
-                post_tag.delete().where(post_tag.c.post_id == db_obj.id)
-            )
-            # Add new tags
+            # Tags are loaded with the post, so replacing the collection lets
+            # the unit of work diff post_tag rows
+            tags = []
             if tag_ids:
-                tags = await db.execute(select(Tag).filter(Tag.id.in_(tag_ids)))
-                db_obj.tags.extend(tags.scalars().all())
+                result = await db.execute(select(Tag).filter(Tag.id.in_(tag_ids)))
+                tags = result.scalars().all()
+            old_ids = {t.id for t in db_obj.tags}
+            new_ids = {t.id for t in tags}
+            await self._add_to_post_counts(db, list(old_ids - new_ids), -1)
+            await self._add_to_post_counts(db, list(new_ids - old_ids), 1)
+            db_obj.tags = tags
         
         return await super().update(db, db_obj=db_obj, obj_in=update_data)
 
+    async def remove(self, db: AsyncSession, *, id: int) -> Post:
+        obj = await self.get(db, id=id)
+        await self._add_to_post_counts(db, [t.id for t in obj.tags], -1)
+        await db.delete(obj)
+        await db.commit()
+        await self.invalidate_cache(obj)
+        return obj
+
+    async def _get_or_create_tag_ids(self, db: AsyncSession, names: Sequence[str]) -> dict:
+        result = await db.execute(select(Tag.id, Tag.name).filter(Tag.name.in_(names)))
+        tag_ids = {name: id for id, name in result}
+        missing = [name for name in names if name not in tag_ids]
+        if missing:
+            # DO UPDATE rather than DO NOTHING so RETURNING also covers tags a
+            # concurrent writer created in the meantime
+            stmt = pg_insert(Tag).values([{"name": name} for name in missing])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Tag.name], set_={"name": stmt.excluded.name}
+            ).returning(Tag.id, Tag.name)
+            result = await db.execute(stmt)
+            tag_ids.update({name: id for id, name in result})
+        return tag_ids
+
+    async def bulk_create(
+        self, db: AsyncSession, *, objs_in: Sequence[PostImport], author_id: int
+    ) -> int:
+        # Core statements, no ORM objects: a tag lookup, one multi-row INSERT
+        # of posts and one of post_tag rows. Not committed by itself
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            insert(self.model).returning(self.model.id, sort_by_parameter_order=True),
+            [
+                {
+                    "title": obj_in.title,
+                    "content": obj_in.content,
+                    "author_id": obj_in.author_id or author_id,
+                    "created_at": obj_in.created_at or now,
+                    "comment_count": 0,
+                }
+                for obj_in in objs_in
+            ],
+        )
+        post_ids = result.scalars().all()
+
+        names = sorted({name for obj_in in objs_in for name in obj_in.tags})
+        if not names:
+            return len(post_ids)
+        tag_ids = await self._get_or_create_tag_ids(db, names)
+        links = [
+            {"post_id": post_id, "tag_id": tag_ids[name]}
+            for post_id, obj_in in zip(post_ids, objs_in)
+            for name in set(obj_in.tags)
+        ]
+        await db.execute(insert(post_tag), links)
+        # One counter UPDATE per distinct increment rather than per tag
+        tags_by_delta = defaultdict(list)
+        for tag_id, delta in Counter(link["tag_id"] for link in links).items():
+            tags_by_delta[delta].append(tag_id)
+        for delta, ids in tags_by_delta.items():
+            await self._add_to_post_counts(db, ids, delta)
+        return len(post_ids)
+
+    async def bulk_import(
+        self, db: AsyncSession, *, objs_in: AsyncIterable[PostImport], author_id: int
+    ) -> int:
+        # Batched, but committed once: an import either fully lands or not at all
+        imported = 0
+        batch = []
+        async for obj_in in objs_in:
+            batch.append(obj_in)
+            if len(batch) == settings.DB_BULK_BATCH_SIZE:
+                imported += await self.bulk_create(db, objs_in=batch, author_id=author_id)
+                batch = []
+        if batch:
+            imported += await self.bulk_create(db, objs_in=batch, author_id=author_id)
+        await db.commit()
+        await cache.flush("post")
+        await cache.flush("tag")
+        await publish_tags_changed()
+        return imported
+
+    async def stream_export(self, db: AsyncSession) -> AsyncIterator[List[Row]]:
+        # Server-side cursor: yields batches of rows shaped like
+        # schemas.post.PostExport without loading the whole table
+        tag_names = (
+            select(Tag.name)
+            .join(post_tag, post_tag.c.tag_id == Tag.id)
+            .where(post_tag.c.post_id == self.model.id)
+            .order_by(Tag.name)
+            .scalar_subquery()
+        )
+        query = select(
+            self.model.id,
+            self.model.title,
+            self.model.content,
+            self.model.author_id,
+            self.model.created_at,
+            self.model.updated_at,
+            func.array(tag_names).label("tags"),
+        ).order_by(self.model.id)
+        result = await db.stream(
+            query.execution_options(yield_per=settings.DB_BULK_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    async def get_feed_ids(
+        self, db: AsyncSession, *, user_id: int, fanned_out: Optional[bool] = None,
+        before: Optional[int] = None, limit: int = 20
+    ) -> List[int]:
+        """Newest ids of posts by authors or in tags ``user_id`` follows. With
+        ``fanned_out`` only the sources fanned out on write (True) or only the
+        popular ones read on demand (False); see app.core.feeds."""
+        def sources(model) -> Any:
+            popular = model.follower_count > settings.FEED_FANOUT_MAX_FOLLOWERS
+            return {None: true(), True: ~popular, False: popular}[fanned_out]
+
+        authors = (
+            select(user_follow.c.author_id)
+            .join(User, User.id == user_follow.c.author_id)
+            .where(user_follow.c.follower_id == user_id, sources(User))
+        )
+        tagged = (
+            select(post_tag.c.post_id)
+            .join(tag_follow, tag_follow.c.tag_id == post_tag.c.tag_id)
+            .join(Tag, Tag.id == post_tag.c.tag_id)
+            .where(tag_follow.c.user_id == user_id, sources(Tag))
+        )
+        query = select(self.model.id).where(
+            or_(self.model.author_id.in_(authors), self.model.id.in_(tagged))
+        )
+        if before is not None:
+            query = query.where(self.model.id < before)
+        result = await db.execute(query.order_by(self.model.id.desc()).limit(limit))
+        return result.scalars().all()
+
+    async def add_views(self, db: AsyncSession, rows: Sequence[dict]) -> None:
+        # rows: {"post_id", "views" (to add), "unique_views" (HyperLogLog estimate,
+        # which restarts once the HyperLogLog expires: never lowers the count)};
+        # one executemany UPDATE, committed
+        if not rows:
+            return
+        table = self.model.__table__
+        await db.execute(
+            update(table)
+            .where(table.c.id == bindparam("post_id"))
+            # Keep updated_at: a view is not an edit
+            .values(
+                view_count=table.c.view_count + bindparam("views"),
+                unique_view_count=func.greatest(
+                    table.c.unique_view_count, bindparam("unique_views")
+                ),
+                updated_at=table.c.updated_at,
+            ),
+            rows,
+        )
+        await db.commit()
+
+    async def recount_comments(self, db: AsyncSession) -> int:
+        # Only rewrites rows that drifted; returns how many were fixed
+        actual = (
+            select(func.count(Comment.id))
+            .where(Comment.post_id == self.model.id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.comment_count != actual)
+            # Keep updated_at: a counter repair is not an edit
+            .values(comment_count=actual, updated_at=self.model.updated_at)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
+
     async def get_multi_with_filters(
-        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, tag_id: int = None
-    ) -> List[Post]:
-        query = select(self.model)
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+        tag_id: int = None, order: str = "default", load: Optional[str] = "default"
+    ) -> Page:
+        query = self.with_profile(select(self.model), load)
         if tag_id:
             query = query.join(self.model.tags).filter(Tag.id == tag_id)
-        result = await db.execute(query.offset(skip).limit(limit))
-        return result.scalars().all()
+        query = self.paginate(query, skip=skip, limit=limit, cursor=cursor, order=order)
+        return await self.fetch_page(db, query, limit=limit, order=order)
+
+    async def search(
+        self, db: AsyncSession, *, q: str, limit: int = 20, cursor: Optional[str] = None
+    ) -> Page:
+        # Rows expose id, title, created_at, author, rank and the two highlights
+        # (schemas.post.PostSearchHit); ordered by rank, then newest first
+        config = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+        ts_query = func.websearch_to_tsquery(config, q)
+        rank = func.ts_rank_cd(self.model.search_vector, ts_query)
+        author = aliased(User, name="author")
+        query = (
+            select(
+                self.model.id,
+                self.model.title,
+                self.model.created_at,
+                author,
+                rank.label("rank"),
+                func.ts_headline(
+                    config, self.model.title, ts_query, "HighlightAll=true"
+                ).label("title_highlight"),
+                func.ts_headline(
+                    config, self.model.content, ts_query, "MaxFragments=2, MaxWords=30"
+                ).label("content_highlight"),
+            )
+            .join(author, self.model.author)
+            .filter(self.model.search_vector.op("@@")(ts_query))
+        )
+        if cursor is not None:
+            last_rank, last_id = decode_cursor(cursor, [float, int])
+            query = query.filter(
+                tuple_(rank, self.model.id) < tuple_(cast(last_rank, Float), last_id)
+            )
+        query = query.order_by(rank.desc(), self.model.id.desc()).limit(limit)
+        result = await db.execute(query)
+        rows = result.all()
+        next_cursor = None
+        if rows and len(rows) == limit:
+            next_cursor = encode_cursor([rows[-1].rank, rows[-1].id])
+        return Page(rows, next_cursor)
 
 post = CRUDPost(Post)
@@ -1,13 +1,70 @@
-from typing import Optional
+from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import joinedload, selectinload
+from app.core import cache
+from app.core.autocomplete import publish_tags_changed
 from app.crud.base import CRUDBase
-from app.db.models.tag import Tag
+from app.db.models.post import Post
+from app.db.models.tag import Tag, post_tag
 from app.schemas.tag import TagCreate, TagUpdate
 
 class CRUDTag(CRUDBase[Tag, TagCreate, TagUpdate]):
+    load_profiles = {
+        # schemas.tag.Tag
+        "default": (
+            selectinload(Tag.posts).options(
+                joinedload(Post.author),
+                selectinload(Post.tags),
+            ),
+        ),
+        # schemas.tag.TagSummary
+        "summary": (),
+    }
+    cache_resource = "tag"
+    orderings = {
+        "default": (("id",), False),
+        "posts": (("post_count", "id"), True),
+    }
+
+    async def invalidate_cache(self, db_obj: Tag) -> None:
+        await super().invalidate_cache(db_obj)
+        # schemas.post.Post embeds tags
+        await cache.flush("post")
+        await publish_tags_changed()
+
     async def get_by_name(self, db: AsyncSession, *, name: str) -> Optional[Tag]:
         result = await db.execute(select(self.model).filter(self.model.name == name))
         return result.scalars().first()
 
+    async def search_similar(self, db: AsyncSession, *, q: str, limit: int = 10) -> List[Tag]:
+        # Prefix or trigram match (pg_trgm, ix_tag_name_trgm serves both), closest first
+        result = await db.execute(
+            select(self.model)
+            .filter(or_(
+                self.model.name.istartswith(q, autoescape=True),
+                self.model.name.op("%")(q),
+            ))
+            .order_by(func.similarity(self.model.name, q).desc(), self.model.post_count.desc())
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    async def recount_posts(self, db: AsyncSession) -> int:
+        # Only rewrites rows that drifted; returns how many were fixed
+        actual = (
+            select(func.count())
+            .select_from(post_tag)
+            .where(post_tag.c.tag_id == self.model.id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.post_count != actual)
+            .values(post_count=actual)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return result.rowcount
+
 tag = CRUDTag(Tag)
@@ -1,12 +1,23 @@
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple, Type, Union
+from sqlalchemy import Table, delete, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async, verify_password_async
+from app.core import cache, feeds, jobs
+from app.core.principals import invalidate_principal
 from app.crud.base import CRUDBase
-from app.db.models.user import User
+from app.db.base_class import Base
+from app.db.models.tag import Tag, tag_follow
+from app.db.models.user import User, user_follow
 from app.schemas.user import UserCreate, UserUpdate
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
+    async def invalidate_cache(self, db_obj: User) -> None:
+        # Authors are embedded in cached posts, comments and tags
+        for resource in ("post", "comment", "tag"):
+            await cache.flush(resource)
+
     async def get_by_email(self, db: AsyncSession, email: str) -> Optional[User]:
         result = await db.execute(select(User).filter(User.email == email))
         return result.scalars().first()
@@ -14,7 +25,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     async def create(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
         db_obj = User(
             email=obj_in.email,
-            hashed_password=get_password_hash(obj_in.password),
+            hashed_password=await get_password_hash_async(obj_in.password),
             full_name=obj_in.full_name,
             is_active=True,
             is_superuser=False,
@@ -22,13 +33,97 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        await jobs.enqueue(
+            "user_created", user_id=db_obj.id, email=db_obj.email, full_name=db_obj.full_name
+        )
+        return db_obj
+
+    async def update(
+        self, db: AsyncSession, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> User:
+        # Tokens are keyed by email, so drop both the old and the new subject
+        old_email = db_obj.email
+        db_obj = await super().update(db, db_obj=db_obj, obj_in=obj_in)
+        await invalidate_principal(old_email, db_obj.email)
         return db_obj
 
+    def _follow_row(
+        self, follower_id: int, author_id: Optional[int], tag_id: Optional[int]
+    ) -> Tuple[Table, Dict[str, int], Type[Base], int]:
+        # (association table, its row, model whose follower_count changes, that row's id)
+        if author_id is not None:
+            return user_follow, {"follower_id": follower_id, "author_id": author_id}, User, author_id
+        return tag_follow, {"user_id": follower_id, "tag_id": tag_id}, Tag, tag_id
+
+    async def _add_to_follower_count(
+        self, db: AsyncSession, model: Type[Base], id: int, delta: int
+    ) -> None:
+        await db.execute(
+            update(model)
+            .where(model.id == id)
+            .values(follower_count=model.follower_count + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def follow(
+        self, db: AsyncSession, *, follower_id: int,
+        author_id: Optional[int] = None, tag_id: Optional[int] = None,
+    ) -> bool:
+        """Follow an author or a tag; False if already followed."""
+        table, row, model, id = self._follow_row(follower_id, author_id, tag_id)
+        result = await db.execute(pg_insert(table).values(**row).on_conflict_do_nothing())
+        followed = result.rowcount == 1
+        if followed:
+            await self._add_to_follower_count(db, model, id, 1)
+        await db.commit()
+        if followed:
+            await feeds.invalidate(follower_id)
+        return followed
+
+    async def unfollow(
+        self, db: AsyncSession, *, follower_id: int,
+        author_id: Optional[int] = None, tag_id: Optional[int] = None,
+    ) -> bool:
+        """Stop following an author or a tag; False if not followed."""
+        table, row, model, id = self._follow_row(follower_id, author_id, tag_id)
+        result = await db.execute(
+            delete(table).where(*(table.c[column] == value for column, value in row.items()))
+        )
+        unfollowed = result.rowcount == 1
+        if unfollowed:
+            await self._add_to_follower_count(db, model, id, -1)
+        await db.commit()
+        if unfollowed:
+            await feeds.invalidate(follower_id)
+        return unfollowed
+
+    async def recount_followers(self, db: AsyncSession) -> int:
+        # user.follower_count and tag.follower_count; only rewrites rows that drifted
+        fixed = 0
+        for model, table, column in (
+            (User, user_follow, "author_id"), (Tag, tag_follow, "tag_id"),
+        ):
+            actual = (
+                select(func.count())
+                .select_from(table)
+                .where(table.c[column] == model.id)
+                .scalar_subquery()
+            )
+            result = await db.execute(
+                update(model)
+                .where(model.follower_count != actual)
+                .values(follower_count=actual)
+                .execution_options(synchronize_session=False)
+            )
+            fixed += result.rowcount
+        await db.commit()
+        return fixed
+
     async def authenticate(self, db: AsyncSession, *, email: str, password: str) -> Optional[User]:
         user = await self.get_by_email(db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         return user
 
@@ -1 +1,7 @@
-
+# Import all the models, so that Base has them before being
+# imported by Alembic
+from app.db.base_class import Base  # noqa
+from app.db.models.user import User  # noqa
+from app.db.models.post import Post  # noqa
+from app.db.models.comment import Comment  # noqa
+from app.db.models.tag import Tag, post_tag  # noqa
@@ -1,16 +1,49 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from typing import Optional
+from sqlalchemy import Column, Index, Integer, String, Text, ForeignKey, DateTime
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
-class Post(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True, nullable=False)
+# Fixed-width segments, so paths sort like the ids in them; "/" is the
+# character after the separator, so "<path>/" bounds a subtree from above
+PATH_SEPARATOR = "."
+PATH_END = "/"
+
+def make_path(parent_path: Optional[str], id: int) -> str:
+    segment = f"{id:010d}"
+    return segment if parent_path is None else f"{parent_path}{PATH_SEPARATOR}{segment}"
+
+class Comment(Base):
+    id = Column(Integer, primary_key=True)
     content = Column(Text, nullable=False)
+    post_id = Column(Integer, ForeignKey("post.id"))
     author_id = Column(Integer, ForeignKey("user.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Replies: NULL for top-level comments
+    parent_id = Column(Integer, ForeignKey("comment.id", ondelete="CASCADE"))
+    # Materialized path, the ids from the top-level comment down to this one
+    # (see make_path): ordering by it lists a thread depth-first, oldest reply
+    # first, and a subtree is one range of it. "C" collation compares bytes
+    path = Column(String(collation="C"), nullable=False)
     
-    author = relationship("User", back_populates="posts")
-    comments = relationship("Comment", back_populates="post")
-    tags = relationship("Tag", secondary="post_tag", back_populates="posts")
+    post = relationship("Post", back_populates="comments")
+    author = relationship("User", back_populates="comments")
+
+    __table_args__ = (
+        Index("ix_comment_post_id_created_at_id", post_id, created_at, id),
+        Index("ix_comment_created_at_id", created_at, id),
+        Index("ix_comment_author_id", author_id),
+        # Threads and subtrees (CRUDComment.get_threads / get_subtree)
+        Index("ix_comment_post_id_path", post_id, path),
+        # Top-level comments of a post, the unit threads are paginated by
+        Index(
+            "ix_comment_post_id_path_top_level", post_id, path,
+            postgresql_where=parent_id.is_(None),
+        ),
+        # Foreign key checks when comments are deleted
+        Index("ix_comment_parent_id", parent_id),
+    )
+
+    @property
+    def depth(self) -> int:
+        return self.path.count(PATH_SEPARATOR)
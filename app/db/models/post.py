@@ -1,16 +1,49 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Computed, Index, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 from app.db.base_class import Base
+from app.db.models.tag import post_tag
+
+# Text search configuration used by search_vector and by queries against it
+SEARCH_CONFIG = "simple"
 
 class Post(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, index=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     author_id = Column(Integer, ForeignKey("user.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Maintained by Postgres (see migration 0002_post_search_vector); never loaded by default
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True,
+        ),
+    ))
+    # Denormalized, maintained by CRUDComment (see utils/repair_counters.py)
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Written behind from Redis by app.core.views.flush, so up to
+    # VIEWS_FLUSH_INTERVAL behind
+    view_count = Column(Integer, nullable=False, default=0, server_default="0")
+    unique_view_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     author = relationship("User", back_populates="posts")
-    comments = relationship("Comment", back_populates="post")
+    # Thread order (see Comment.path)
+    comments = relationship("Comment", back_populates="post", order_by="Comment.path")
     tags = relationship("Tag", secondary="post_tag", back_populates="posts")
+
+    __table_args__ = (
+        Index("ix_post_search_vector", search_vector, postgresql_using="gin"),
+        Index("ix_post_comment_count_id", comment_count, id),
+        Index("ix_post_view_count_id", view_count, id),
+        # Keyset orderings of list queries (see CRUDPost.orderings)
+        Index("ix_post_created_at_id", created_at, id),
+        Index("ix_post_author_id_created_at_id", author_id, created_at, id),
+    )
+    # Don't RETURNING server-generated values (search_vector) on every insert;
+    # CRUD re-selects written rows with the columns it needs
+    __mapper_args__ = {"eager_defaults": False}
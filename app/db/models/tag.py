@@ -1,17 +1,51 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import DDL, Column, Index, Integer, String, Table, ForeignKey, event
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
-class Tag(Base):
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True, nullable=False)
-    
-    posts = relationship("Post", secondary="post_tag", back_populates="tags")
-
 # Association table for many-to-many relationship between Post and Tag
 post_tag = Table(
     "post_tag",
     Base.metadata,
     Column("post_id", Integer, ForeignKey("post.id"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("tag.id"), primary_key=True),
+    # The primary key serves post -> tags; this one tag -> posts
+    Index("ix_post_tag_tag_id_post_id", "tag_id", "post_id"),
+)
+
+# Users following a tag get its new posts in their feed
+tag_follow = Table(
+    "tag_follow",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tag.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key serves user -> tags; this one tag -> followers (fan-out)
+    Index("ix_tag_follow_tag_id_user_id", "tag_id", "user_id"),
+)
+
+class Tag(Base):
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True, nullable=False)
+    # Denormalized, maintained by CRUDPost (see utils/repair_counters.py)
+    post_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # Denormalized, maintained by CRUDUser.follow/unfollow (see utils/repair_counters.py)
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    posts = relationship("Post", secondary="post_tag", back_populates="tags")
+    followers = relationship(
+        "User", secondary=tag_follow, back_populates="followed_tags", passive_deletes=True
+    )
+
+    __table_args__ = (
+        Index("ix_tag_post_count_id", post_count, id),
+        # Fallback of GET /tags/autocomplete (CRUDTag.search_similar)
+        Index(
+            "ix_tag_name_trgm", name,
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
+# create_all (tests, DB_SCHEMA_STARTUP=create) needs the extension the index uses
+event.listen(
+    Tag.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
 )
@@ -1,14 +1,42 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Boolean, Table
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base
 
+# Who follows whom: the author's new posts go to the follower's feed
+user_follow = Table(
+    "user_follow",
+    Base.metadata,
+    Column("follower_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("author_id", Integer, ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    # The primary key serves follower -> authors; this one author -> followers (fan-out)
+    Index("ix_user_follow_author_id_follower_id", "author_id", "follower_id"),
+)
+
 class User(Base):
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     full_name = Column(String)
     is_active = Column(Boolean(), default=True)
     is_superuser = Column(Boolean(), default=False)
+    # Denormalized, maintained by CRUDUser.follow/unfollow (see utils/repair_counters.py)
+    follower_count = Column(Integer, nullable=False, default=0, server_default="0")
     
     posts = relationship("Post", back_populates="author")
     comments = relationship("Comment", back_populates="author")
+    # Follow rows are removed by the database (ON DELETE CASCADE), never loaded for it
+    following = relationship(
+        "User", secondary=user_follow,
+        primaryjoin=id == user_follow.c.follower_id,
+        secondaryjoin=id == user_follow.c.author_id,
+        back_populates="followers", passive_deletes=True,
+    )
+    followers = relationship(
+        "User", secondary=user_follow,
+        primaryjoin=id == user_follow.c.author_id,
+        secondaryjoin=id == user_follow.c.follower_id,
+        back_populates="following", passive_deletes=True,
+    )
+    followed_tags = relationship(
+        "Tag", secondary="tag_follow", back_populates="followers", passive_deletes=True
+    )
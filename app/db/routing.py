@@ -0,0 +1,193 @@
+"""Read-replica routing for request sessions.
+
+``get_db`` gives GET/HEAD requests a session on a healthy replica and every
+other request (and all background code, which uses AsyncSessionLocal) the
+primary. A replica is eligible while its last health check succeeded and its
+replay lag was at most DB_REPLICA_MAX_LAG_SECONDS; with none eligible, reads
+go to the primary.
+
+Read-your-writes: a request that commits marks its caller (token subject, or
+client IP when anonymous) in Redis before the response is sent, and that
+caller's reads use the primary, past the response cache, for
+DB_READ_YOUR_WRITES_SECONDS. Cached responses are built from the primary
+whatever the request was routed to, since they outlive a replica's lag.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from fastapi import Request
+from redis.exceptions import RedisError
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core import cache
+from app.core.config import settings
+from app.core.security import decode_token
+from app.db.session import AsyncSessionLocal, replica_engines
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+# (pg_last_xact_replay_timestamp alone grows while the primary is idle)
+LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+class ReplicaSet:
+    def __init__(self, engines: List[AsyncEngine]):
+        self.engines = engines
+        # Unknown until the first check: not used before it
+        self.healthy: Dict[AsyncEngine, bool] = {engine: False for engine in engines}
+        self.lag: Dict[AsyncEngine, Optional[float]] = {engine: None for engine in engines}
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def eligible(self) -> List[AsyncEngine]:
+        return [
+            engine for engine in self.engines
+            if self.healthy[engine] and self.lag[engine] <= settings.DB_REPLICA_MAX_LAG_SECONDS
+        ]
+
+    def choose(self) -> Optional[AsyncEngine]:
+        engines = self.eligible()
+        if not engines:
+            return None
+        if settings.DB_REPLICA_SELECTION == "least_connections":
+            return min(engines, key=lambda engine: engine.pool.checkedout())
+        return engines[next(self._next) % len(engines)]
+
+    async def check(self) -> None:
+        for engine in self.engines:
+            try:
+                async with engine.connect() as conn:
+                    lag = (await conn.execute(LAG_QUERY)).scalar()
+            except Exception:
+                if self.healthy[engine]:
+                    logger.warning("Replica %s failed its health check", engine.url, exc_info=True)
+                self.healthy[engine], self.lag[engine] = False, None
+                continue
+            if lag is None:
+                # pg_last_wal_receive_lsn() is NULL on a primary: no replication to wait for
+                lag = 0.0
+            self.healthy[engine], self.lag[engine] = True, float(lag)
+
+    async def _check_forever(self) -> None:
+        while True:
+            await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL)
+            await self.check()
+
+    async def start(self) -> None:
+        if self.engines:
+            await self.check()
+            self._task = asyncio.create_task(self._check_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for engine in self.engines:
+            await engine.dispose()
+
+    def status(self) -> List[Dict]:
+        return [
+            {
+                "url": engine.url.render_as_string(hide_password=True),
+                "healthy": self.healthy[engine],
+                "lag_seconds": self.lag[engine],
+                "checked_out": engine.pool.checkedout(),
+            }
+            for engine in self.engines
+        ]
+
+replicas = ReplicaSet(replica_engines)
+
+def caller_key(scope: Scope) -> str:
+    authorization = Headers(scope=scope).get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = decode_token(token)
+        if payload is not None and payload.sub:
+            return f"user:{payload.sub}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+# Local stand-in when Redis is unavailable: caller -> expiry (monotonic)
+_local_sticky: Dict[str, float] = {}
+
+async def mark_wrote(caller: str) -> None:
+    window = settings.DB_READ_YOUR_WRITES_SECONDS
+    _local_sticky[caller] = time.monotonic() + window
+    if len(_local_sticky) > 10000:
+        now = time.monotonic()
+        for key in [key for key, expires in _local_sticky.items() if expires < now]:
+            del _local_sticky[key]
+    if cache.redis is None:
+        return
+    try:
+        await cache.redis.set(f"sticky:{caller}", 1, px=int(window * 1000))
+    except RedisError:
+        logger.warning("Could not record write of %s", caller, exc_info=True)
+
+async def wrote_recently(caller: str) -> bool:
+    if _local_sticky.get(caller, 0) > time.monotonic():
+        return True
+    if cache.redis is None:
+        return False
+    try:
+        return bool(await cache.redis.exists(f"sticky:{caller}"))
+    except RedisError:
+        logger.warning("Could not read write marker of %s", caller, exc_info=True)
+        # Unknown: the primary is always consistent
+        return True
+
+# Per-request flag set by the commit hook below
+_wrote: ContextVar[Optional[List[bool]]] = ContextVar("request_wrote", default=None)
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    flag = _wrote.get()
+    if flag is not None:
+        flag[0] = True
+
+class ReadYourWritesMiddleware:
+    """Marks callers whose request committed, before its response starts."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not replicas.engines:
+            await self.app(scope, receive, send)
+            return
+        flag = [False]
+        token = _wrote.set(flag)
+
+        async def send_after_marking(message: Message) -> None:
+            if message["type"] == "http.response.start" and flag[0]:
+                await mark_wrote(caller_key(scope))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_after_marking)
+        finally:
+            _wrote.reset(token)
+
+async def get_db(request: Request) -> AsyncSession:
+    engine = None
+    if request.method in ("GET", "HEAD") and replicas.engines:
+        # Recorded for app.core.cache, which runs after this dependency: a
+        # caller who wrote skips cached responses, and entries are built from
+        # the primary rather than from a replica
+        request.state.read_your_writes = await wrote_recently(caller_key(request.scope))
+        if not request.state.read_your_writes:
+            engine = replicas.choose()
+    request.state.replica = engine is not None
+    session = AsyncSessionLocal() if engine is None else AsyncSessionLocal(bind=engine)
+    async with session:
+        yield session
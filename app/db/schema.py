@@ -0,0 +1,38 @@
+from pathlib import Path
+from typing import Set
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import async_engine
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+def expected_revisions() -> Set[str]:
+    config = Config(str(PROJECT_ROOT / "alembic.ini"))
+    config.set_main_option("script_location", str(PROJECT_ROOT / "migrations"))
+    return set(ScriptDirectory.from_config(config).get_heads())
+
+async def current_revisions() -> Set[str]:
+    async with async_engine.connect() as conn:
+        return set(await conn.run_sync(
+            lambda sync_conn: MigrationContext.configure(sync_conn).get_current_heads()
+        ))
+
+async def prepare_schema() -> None:
+    """Run at startup according to DB_SCHEMA_STARTUP.
+
+    "verify" only compares the database's Alembic revision with the code's
+    (one query); migrations are applied beforehand with ``alembic upgrade head``.
+    """
+    if settings.DB_SCHEMA_STARTUP == "create":
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    elif settings.DB_SCHEMA_STARTUP == "verify":
+        current, expected = await current_revisions(), expected_revisions()
+        if current != expected:
+            raise RuntimeError(
+                f"Database schema is at revision {sorted(current) or 'none'}, "
+                f"the code expects {sorted(expected)}; run `alembic upgrade head`."
+            )
@@ -1,14 +1,88 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import time
+from typing import Any, Dict, List
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
+from app.core.timing import instrument_engine
 
-async_engine = create_async_engine(settings.DATABASE_URL, echo=True)
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def recreate(self):
+        # Keep counters across pool recreation (e.g. after invalidation)
+        pool = super().recreate()
+        pool.checkouts = self.checkouts
+        pool.timeouts = self.timeouts
+        pool.wait_seconds_total = self.wait_seconds_total
+        pool.wait_seconds_max = self.wait_seconds_max
+        return pool
+
+def make_engine(url: str, **server_settings: str) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=settings.DB_ECHO,
+        poolclass=InstrumentedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"server_settings": {
+            "statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS), **server_settings
+        }},
+    )
+    instrument_engine(engine.sync_engine)
+    return engine
+
+async_engine = make_engine(settings.DATABASE_URL)
+# Read-only GET traffic (see app.db.routing); a stray write fails instead of
+# being attempted on a standby
+replica_engines: List[AsyncEngine] = [
+    make_engine(url, default_transaction_read_only="on")
+    for url in settings.DATABASE_REPLICA_URLS
+]
 AsyncSessionLocal = sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
-async def get_db() -> AsyncSession:
+def pool_status(engine: AsyncEngine = async_engine) -> Dict[str, Any]:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checkouts": pool.checkouts,
+        "timeouts": pool.timeouts,
+        "wait_seconds_total": pool.wait_seconds_total,
+        "wait_seconds_max": pool.wait_seconds_max,
+    }
+
+async def get_primary_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
@@ -1,13 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from app.core.config import settings
+from app.core.security import shutdown_hash_executor
 from app.api.v1.api import api_router
-from app.db.session import async_engine
-from app.db.base_class import Base
+from app.core import principals
+from app.core.autocomplete import tag_index
+from app.core.cache import close_redis, init_redis
+from app.core.metrics import PrometheusMiddleware, metrics_response
+from app.core.timing import ServerTimingMiddleware
+from app.db.routing import ReadYourWritesMiddleware, replicas
+from app.db.schema import prepare_schema
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
 )
 
 # CORS
@@ -20,13 +28,35 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# Callers who just committed read from the primary, not a replica
+app.add_middleware(ReadYourWritesMiddleware)
+# Server-Timing header and per-request log line (db, redis, serialization)
+app.add_middleware(ServerTimingMiddleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(PrometheusMiddleware)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 @app.on_event("startup")
 async def startup():
-    # Create db tables
-    async with async_engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await prepare_schema()
+    await init_redis()
+    await replicas.start()
+    await tag_index.start()
+    await principals.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await tag_index.stop()
+    await principals.stop()
+    await replicas.stop()
+    await close_redis()
+    shutdown_hash_executor()
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
 
 @app.get("/")
 def read_root():
@@ -1,12 +1,14 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 from app.schemas.user import User
 
 class CommentBase(BaseModel):
     content: str
 
 class CommentCreate(CommentBase):
-    pass
+    # Comment replied to, on the same post
+    parent_id: Optional[int] = None
 
 class CommentUpdate(BaseModel):
     content: Optional[str] = None
@@ -15,6 +17,9 @@ class Comment(CommentBase):
     id: int
     author: User
     created_at: datetime
+    parent_id: Optional[int] = None
+    # 0 for top-level comments
+    depth: int = 0
     
     class Config:
         orm_mode = True
@@ -1,9 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from datetime import datetime
 from typing import List, Optional
 from app.schemas.user import User
 from app.schemas.comment import Comment
-from app.schemas.tag import Tag
+from app.schemas.tag import Tag, TagInDBBase
 
 class PostBase(BaseModel):
     title: str
@@ -23,7 +23,61 @@ class Post(PostBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     comments: List[Comment] = []
-    tags: List[Tag] = []
+    tags: List[TagInDBBase] = []
+    view_count: int = 0
     
     class Config:
         orm_mode = True
+
+class PostSummary(BaseModel):
+    id: int
+    title: str
+    author: User
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    comment_count: int = 0
+    view_count: int = 0
+    tags: List[str] = []
+    
+    class Config:
+        orm_mode = True
+
+    @validator("tags", pre=True)
+    def tag_names(cls, v):
+        return [getattr(t, "name", t) for t in v]
+
+class PostImport(PostBase):
+    # One NDJSON line of POST /posts/import; tags are names, created if missing.
+    # author_id defaults to the importing admin, created_at to the import time
+    author_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    tags: List[str] = []
+
+class PostExport(PostBase):
+    # One NDJSON line of GET /posts/export; re-importable as PostImport
+    id: int
+    author_id: Optional[int] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    tags: List[str] = []
+    
+    class Config:
+        orm_mode = True
+
+class PostImportResult(BaseModel):
+    imported: int
+
+class PostSearchHit(BaseModel):
+    id: int
+    title: str
+    author: User
+    created_at: datetime
+    rank: float
+    # ts_headline fragments with matches wrapped in <b></b>
+    title_highlight: str
+    content_highlight: str
+    
+    class Config:
+        orm_mode = True
+
+Tag.update_forward_refs(PostSummary=PostSummary)
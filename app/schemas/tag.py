@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from app.schemas.post import Post
+from typing import List, Optional
 
 class TagBase(BaseModel):
     name: str
@@ -10,9 +10,17 @@ class TagCreate(TagBase):
 class TagUpdate(BaseModel):
     name: Optional[str] = None
 
-class Tag(TagBase):
+class TagInDBBase(TagBase):
     id: int
-    posts: list[Post] = []
     
     class Config:
         orm_mode = True
+
+class TagSummary(TagInDBBase):
+    post_count: int = 0
+
+class Tag(TagInDBBase):
+    posts: List["PostSummary"] = []
+
+# Post embeds tags, so the forward reference is resolved in app.schemas.post
+import app.schemas.post  # noqa: E402,F401
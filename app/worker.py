@@ -0,0 +1,34 @@
+"""Background job worker::
+
+    python -m app.worker
+
+Run as many as needed; they share the stream through the consumer group.
+SIGTERM/SIGINT finish the current batch and exit.
+"""
+import asyncio
+import logging
+import signal
+from app.core import cache, views
+from app.core.jobs import Worker
+from app.db.session import async_engine
+import app.core.feeds  # noqa: F401  (registers the handlers)
+import app.core.notifications  # noqa: F401
+
+async def main() -> None:
+    await cache.init_redis()
+    worker = Worker(cache.redis)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, setattr, worker, "stopping", True)
+    # View counts are written behind from here too (see app.core.views)
+    flusher = asyncio.create_task(views.flush_forever())
+    try:
+        await worker.run()
+    finally:
+        flusher.cancel()
+        await cache.close_redis()
+        await async_engine.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    asyncio.run(main())
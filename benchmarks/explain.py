@@ -0,0 +1,106 @@
+"""Check that every list query is answered from an index on seeded data.
+
+Runs ``EXPLAIN`` for the statements behind the list endpoints (first page and
+a deep cursor page) and exits non-zero if any of them scans a large table
+sequentially::
+
+    python -m benchmarks.seed --reset --posts 50000 --comments 200000
+    python -m benchmarks.explain
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, Iterator, List, Tuple
+from sqlalchemy import func, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql import Select
+from app.crud.comment import comment
+from app.crud.post import post
+from app.crud.tag import tag
+from app.db.models.comment import Comment
+from app.db.models.post import Post
+from app.db.models.tag import Tag, post_tag
+from app.db.session import AsyncSessionLocal, async_engine
+
+# Tables whose sequential scan is a regression; tag and user are small
+LARGE_TABLES = {"post", "comment", "post_tag"}
+
+def plan_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+async def explain(db, query: Select) -> Dict[str, Any]:
+    sql = query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    return result.scalar()[0]["Plan"]
+
+async def cursor_after(db, crud, query: Select, order: str = "default", depth: int = 1000) -> str:
+    # Cursor of a page `depth` rows in, to check deep pages stay index-driven
+    page = await crud.fetch_page(
+        db, crud.paginate(query, limit=depth, order=order), limit=depth, order=order
+    )
+    return page.next_cursor
+
+async def list_queries(db) -> List[Tuple[str, Select]]:
+    hot_tag = (await db.execute(select(Tag.id).order_by(Tag.post_count.desc()).limit(1))).scalar()
+    busy_post = (await db.execute(
+        select(Post.id).order_by(Post.comment_count.desc()).limit(1)
+    )).scalar()
+    author = (await db.execute(
+        select(Post.author_id).group_by(Post.author_id).order_by(func.count().desc()).limit(1)
+    )).scalar()
+
+    posts = select(Post)
+    by_tag = select(Post).join(Post.tags).filter(Tag.id == hot_tag)
+    by_author = select(Post).filter(Post.author_id == author)
+    by_post = select(Comment).filter(Comment.post_id == busy_post)
+    comments = select(Comment)
+    tags = select(Tag)
+    return [
+        ("GET /posts/", post.paginate(posts, limit=20)),
+        ("GET /posts/?cursor=", post.paginate(
+            posts, limit=20, cursor=await cursor_after(db, post, posts))),
+        ("GET /posts/?sort=comments", post.paginate(posts, limit=20, order="comments")),
+        ("GET /posts/?tag_id=", post.paginate(by_tag, limit=20)),
+        ("GET /posts/?tag_id=&cursor=", post.paginate(
+            by_tag, limit=20, cursor=await cursor_after(db, post, by_tag, depth=100))),
+        ("posts by author", post.paginate(by_author, limit=20)),
+        ("GET /comments/", comment.paginate(comments, limit=20)),
+        ("GET /comments/?post_id=", comment.paginate(by_post, limit=20)),
+        ("GET /tags/?sort=posts", tag.paginate(tags, limit=20, order="posts")),
+        # The "summary" profile's tag lookup for a page of posts
+        ("post_tag by post", select(post_tag).filter(post_tag.c.post_id.in_([busy_post]))),
+    ]
+
+async def run(args: argparse.Namespace) -> int:
+    failures = 0
+    async with AsyncSessionLocal() as db:
+        for name, query in await list_queries(db):
+            plan = await explain(db, query)
+            scans = [
+                f"{node['Node Type']} on {node['Relation Name']}"
+                for node in plan_nodes(plan) if "Relation Name" in node
+            ]
+            seq_scans = [
+                node["Relation Name"] for node in plan_nodes(plan)
+                if node["Node Type"] == "Seq Scan" and node["Relation Name"] in LARGE_TABLES
+            ]
+            status = "FAIL" if seq_scans else "ok"
+            failures += bool(seq_scans)
+            print(f"{status:<4} {name:<28} cost={plan['Total Cost']:<10} {'; '.join(scans)}")
+            if args.verbose:
+                print(json.dumps(plan, indent=2))
+    await async_engine.dispose()
+    return failures
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="print full plans")
+    failures = asyncio.run(run(parser.parse_args()))
+    if failures:
+        sys.exit(f"{failures} list queries scan a large table sequentially")
+
+if __name__ == "__main__":
+    main()
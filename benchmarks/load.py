@@ -0,0 +1,301 @@
+"""Throughput, latency and queries per request of a weighted request mix.
+
+Seed the database first (``python -m benchmarks.seed --reset``), then::
+
+    python -m benchmarks.load --mix mixed --concurrency 32 --duration 30 \\
+        --output bench.json
+    python -m benchmarks.load --mix mixed --baseline bench.json
+
+By default ``app.main:app`` is driven in-process over ASGI, with rate limits
+off (``--rate-limits`` keeps them); ``--base-url`` targets a running server
+instead, which should run with RATE_LIMIT_ENABLED=false: the login and
+comment limits otherwise turn most of the "login", "write" and "mixed" load
+into 429s. SQL statements per request are read from the ``Server-Timing``
+header. Only 2xx responses count towards throughput and latency; others are
+reported per status, and any 429 fails the run. Results are written as JSON
+per endpoint; with ``--baseline`` the run exits non-zero when an endpoint got
+slower, lost throughput beyond ``--tolerance``, or issues more queries than
+before.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import httpx
+from benchmarks.seed import BENCH_PASSWORD, WORDS, user_email
+from benchmarks.stats import percentile
+
+# Operation name -> weight
+MIXES = {
+    "read": {
+        "list_posts": 35, "get_post": 30, "list_tags": 10, "list_comments": 15, "search": 10,
+    },
+    "login": {"login": 1},
+    "write": {"create_comment": 1},
+    "mixed": {
+        "list_posts": 25, "get_post": 25, "list_tags": 5, "list_comments": 10, "search": 10,
+        "login": 5, "create_comment": 20,
+    },
+}
+
+# Statement count from app.core.timing's Server-Timing header
+DB_TIMING = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries')
+
+def statements_of(response: httpx.Response) -> Optional[int]:
+    match = DB_TIMING.search(response.headers.get("server-timing", ""))
+    return int(match.group(1)) if match else None
+
+class Fixture:
+    """Ids and tokens discovered from the seeded data before the run."""
+
+    def __init__(self, post_ids: List[int], tokens: List[str], users: int):
+        self.post_ids = post_ids
+        self.tokens = tokens
+        self.users = users
+
+Operation = Callable[[httpx.AsyncClient, Fixture, random.Random], Awaitable[httpx.Response]]
+
+async def list_posts(client, fixture, rng):
+    return await client.get("/api/v1/posts/", params={"limit": 20})
+
+async def get_post(client, fixture, rng):
+    return await client.get(f"/api/v1/posts/{rng.choice(fixture.post_ids)}")
+
+async def list_tags(client, fixture, rng):
+    return await client.get("/api/v1/tags/")
+
+async def list_comments(client, fixture, rng):
+    return await client.get("/api/v1/comments/", params={"post_id": rng.choice(fixture.post_ids)})
+
+async def search(client, fixture, rng):
+    return await client.get("/api/v1/posts/search", params={"q": rng.choice(WORDS)})
+
+async def login(client, fixture, rng):
+    return await client.post(
+        "/api/v1/auth/login",
+        data={"username": user_email(rng.randrange(fixture.users)), "password": BENCH_PASSWORD},
+    )
+
+async def create_comment(client, fixture, rng):
+    return await client.post(
+        "/api/v1/comments/",
+        params={"post_id": rng.choice(fixture.post_ids)},
+        json={"content": "Benchmark comment"},
+        headers={"Authorization": f"Bearer {rng.choice(fixture.tokens)}"},
+    )
+
+# Operation name -> (report label, operation)
+OPERATIONS: Dict[str, Tuple[str, Operation]] = {
+    "list_posts": ("GET /posts/", list_posts),
+    "get_post": ("GET /posts/{post_id}", get_post),
+    "list_tags": ("GET /tags/", list_tags),
+    "list_comments": ("GET /comments/", list_comments),
+    "search": ("GET /posts/search", search),
+    "login": ("POST /auth/login", login),
+    "create_comment": ("POST /comments/", create_comment),
+}
+
+async def discover(client: httpx.AsyncClient, args: argparse.Namespace) -> Fixture:
+    response = await client.get("/api/v1/posts/", params={"limit": 1000})
+    response.raise_for_status()
+    post_ids = [item["id"] for item in response.json()]
+    if not post_ids:
+        sys.exit("no posts found: run `python -m benchmarks.seed` first")
+    tokens = []
+    for n in range(min(args.tokens, args.users)):
+        response = await client.post(
+            "/api/v1/auth/login", data={"username": user_email(n), "password": BENCH_PASSWORD}
+        )
+        response.raise_for_status()
+        tokens.append(response.json()["access_token"])
+    return Fixture(post_ids, tokens, args.users)
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statements: Dict[str, List[int]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, label: str, elapsed: float, status: int, statements: Optional[int]) -> None:
+        self.statuses[label][status] += 1
+        # Rejected requests (429s above all) are not throughput
+        if not 200 <= status < 300:
+            return
+        self.latencies[label].append(elapsed * 1000)
+        if statements is not None:
+            self.statements[label].append(statements)
+
+    def report(self, duration: float) -> Dict[str, Dict[str, Any]]:
+        endpoints = {}
+        for label, statuses in sorted(self.statuses.items()):
+            samples = self.latencies.get(label)
+            statements = self.statements.get(label)
+            endpoints[label] = {
+                "requests": sum(statuses.values()),
+                "errors": sum(n for status, n in statuses.items() if not 200 <= status < 300),
+                "statuses": {str(status): n for status, n in sorted(statuses.items())},
+                "rps": round(len(samples or ()) / duration, 2),
+                "p50_ms": round(statistics.median(samples), 2) if samples else None,
+                "p95_ms": round(percentile(samples, 95), 2) if samples else None,
+                "p99_ms": round(percentile(samples, 99), 2) if samples else None,
+                "max_ms": round(max(samples), 2) if samples else None,
+                "queries_per_request": (
+                    round(statistics.mean(statements), 2) if statements else None
+                ),
+            }
+        return endpoints
+
+async def worker(
+    client: httpx.AsyncClient, fixture: Fixture, recorder: Recorder, mix: Dict[str, int],
+    rng: random.Random, record_from: float, deadline: float,
+) -> None:
+    names, weights = list(mix), list(mix.values())
+    while True:
+        label, operation = OPERATIONS[rng.choices(names, weights)[0]]
+        started = time.perf_counter()
+        try:
+            response = await operation(client, fixture, rng)
+            status, statements = response.status_code, statements_of(response)
+        except httpx.HTTPError:
+            status, statements = 599, None
+        finished = time.perf_counter()
+        if finished > deadline:
+            return
+        if started >= record_from:
+            recorder.record(label, finished - started, status, statements)
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    in_process = args.base_url is None
+    if in_process:
+        from app.core.config import settings
+        from app.db.session import async_engine
+        from app.main import app
+        settings.RATE_LIMIT_ENABLED = args.rate_limits
+        await app.router.startup()
+        client = httpx.AsyncClient(app=app, base_url="http://bench", timeout=60)
+    else:
+        client = httpx.AsyncClient(
+            base_url=args.base_url,
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        )
+    try:
+        fixture = await discover(client, args)
+        recorder = Recorder()
+        now = time.perf_counter()
+        record_from = now + args.warmup
+        deadline = record_from + args.duration
+        await asyncio.gather(*(
+            worker(
+                client, fixture, recorder, MIXES[args.mix], random.Random(args.seed + n),
+                record_from, deadline,
+            )
+            for n in range(args.concurrency)
+        ))
+    finally:
+        await client.aclose()
+        if in_process:
+            await app.router.shutdown()
+            await async_engine.dispose()
+    return {
+        "meta": {
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "seed": args.seed,
+            "target": args.base_url or "in-process",
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        },
+        "endpoints": recorder.report(args.duration),
+    }
+
+def regressions(
+    result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    found = []
+    for label, current in result["endpoints"].items():
+        before = baseline["endpoints"].get(label)
+        if before is None:
+            continue
+        if current["p95_ms"] is None or before["p95_ms"] is None:
+            if current["p95_ms"] is None and before["p95_ms"] is not None:
+                found.append(f"{label}: no successful requests")
+            continue
+        if current["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            found.append(f"{label}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rps"] < before["rps"] * (1 - tolerance):
+            found.append(f"{label}: rps {before['rps']} -> {current['rps']}")
+        # Statement counts are deterministic: any increase is an N+1 suspect
+        if (
+            current["queries_per_request"] is not None
+            and before.get("queries_per_request") is not None
+            and current["queries_per_request"] > before["queries_per_request"] + 0.05
+        ):
+            found.append(
+                f"{label}: queries/request {before['queries_per_request']}"
+                f" -> {current['queries_per_request']}"
+            )
+    return found
+
+def print_table(result: Dict[str, Any]) -> None:
+    print(f"{'endpoint':<24} {'reqs':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'q/req':>6}")
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.1f}"
+
+    for label, row in result["endpoints"].items():
+        queries = "-" if row["queries_per_request"] is None else f"{row['queries_per_request']:.1f}"
+        print(
+            f"{label:<24} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8.1f} "
+            f"{ms(row['p50_ms']):>8} {ms(row['p95_ms']):>8} {ms(row['p99_ms']):>8} {queries:>6}"
+        )
+
+def rate_limited(result: Dict[str, Any]) -> int:
+    return sum(row["statuses"].get("429", 0) for row in result["endpoints"].values())
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="running server; default drives app.main:app in-process")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=100, help="as passed to benchmarks.seed")
+    parser.add_argument("--tokens", type=int, default=8, help="users logged in for writes")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--rate-limits", action="store_true", help="keep rate limits on (in-process only)"
+    )
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_table(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    limited = rate_limited(result)
+    if limited:
+        print(
+            f"{limited} requests were rate limited (429): run the server with "
+            "RATE_LIMIT_ENABLED=false"
+        )
+        sys.exit(1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(result, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""p99 latency of ``GET /posts/`` with and without a concurrent login burst.
+
+Runs against a live server, e.g.::
+
+    RATE_LIMIT_ENABLED=false uvicorn app.main:app --workers 1
+    python -m benchmarks.login_burst --email user@example.com --password secret
+
+Rate limits must be off: with the per-IP login limit the burst would mostly
+get 429s instead of hashing passwords. Only successful logins are counted,
+and the run fails if any login was rejected.
+
+With bcrypt on the event loop the "burst" p99 grows to roughly the cost of
+all concurrent hashes; with the hash executor it should stay close to the
+baseline.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from collections import Counter
+from typing import List
+import httpx
+from benchmarks.stats import percentile
+
+async def sample_reads(client: httpx.AsyncClient, duration: float) -> List[float]:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/api/v1/posts/", params={"limit": 20})
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+async def login_loop(
+    client: httpx.AsyncClient, args: argparse.Namespace, duration: float
+) -> Counter:
+    statuses: Counter = Counter()
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        response = await client.post(
+            "/api/v1/auth/login", data={"username": args.email, "password": args.password}
+        )
+        statuses[response.status_code] += 1
+    return statuses
+
+async def run(args: argparse.Namespace) -> None:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        baseline = await sample_reads(client, args.duration)
+        readers = sample_reads(client, args.duration)
+        burst = [login_loop(client, args, args.duration) for _ in range(args.concurrency)]
+        results = await asyncio.gather(readers, *burst)
+    under_load, statuses = results[0], sum(results[1:], Counter())
+    logins = statuses[200]
+
+    for name, samples in (("baseline", baseline), ("burst", under_load)):
+        print(
+            f"{name:>8}: n={len(samples)} "
+            f"p50={statistics.median(samples):.1f}ms "
+            f"p99={percentile(samples, 99):.1f}ms"
+        )
+    print(f"logins during burst: {logins} ({logins / args.duration:.1f}/s)")
+    failed = {status: n for status, n in statuses.items() if status != 200}
+    if failed:
+        hint = " (run the server with RATE_LIMIT_ENABLED=false)" if 429 in failed else ""
+        sys.exit(f"failed logins by status: {failed}{hint}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    asyncio.run(run(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Fill the configured database with a reproducible benchmark data set.
+
+The same ``--seed`` and volumes always produce the same rows, so runs of
+``benchmarks.load`` on different commits are comparable::
+
+    python -m benchmarks.seed --reset --users 200 --posts 20000 --comments 100000
+
+Every seeded user logs in with ``BENCH_PASSWORD``; ``bench-admin@example.com``
+is a superuser and ``bench-user-<n>@example.com`` are regular users.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from sqlalchemy import func, insert, select, text
+from app.core import cache
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.crud.post import post
+from app.db.base import Base
+from app.db.models.comment import Comment, make_path
+from app.db.models.user import User
+from app.db.session import AsyncSessionLocal, async_engine
+from app.schemas.post import PostImport
+
+BENCH_PASSWORD = "benchmark"
+ADMIN_EMAIL = "bench-admin@example.com"
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+WORDS = (
+    "python fastapi postgres redis async cache index query latency throughput "
+    "worker pool cursor replica stream batch token search comment tag feed "
+    "deploy release backup schema migration profile metric trace budget"
+).split()
+
+def user_email(n: int) -> str:
+    return f"bench-user-{n}@example.com"
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+def batches(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+async def seed(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    if args.reset:
+        async with async_engine.begin() as conn:
+            tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+            await conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+        # Cached responses would describe the old rows
+        await cache.init_redis()
+        for resource in ("post", "comment", "tag"):
+            await cache.flush(resource)
+        await cache.close_redis()
+
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        # One bcrypt hash for everyone: seeding 10k users shouldn't take minutes
+        hashed_password = get_password_hash(BENCH_PASSWORD)
+        users = [{
+            "email": ADMIN_EMAIL, "hashed_password": hashed_password,
+            "full_name": "Bench Admin", "is_active": True, "is_superuser": True,
+        }] + [{
+            "email": user_email(n), "hashed_password": hashed_password,
+            "full_name": f"Bench User {n}", "is_active": True, "is_superuser": False,
+        } for n in range(args.users)]
+        result = await db.execute(insert(User).returning(User.id), users)
+        user_ids = result.scalars().all()
+
+        tag_names = [f"bench-tag-{n}" for n in range(args.tags)]
+        posts = [
+            PostImport(
+                title=sentence(rng, rng.randint(3, 8)),
+                content=" ".join(sentence(rng, 12) + "." for _ in range(rng.randint(2, 10))),
+                author_id=rng.choice(user_ids),
+                created_at=START + timedelta(minutes=n),
+                # Skewed so a few tags are hot, like real blogs
+                tags=sorted({
+                    tag_names[min(int(rng.expovariate(5 / len(tag_names))), len(tag_names) - 1)]
+                    for _ in range(rng.randint(0, 4))
+                }) if tag_names else [],
+            )
+            for n in range(args.posts)
+        ]
+        for batch in batches(posts, settings.DB_BULK_BATCH_SIZE):
+            await post.bulk_create(db, objs_in=batch, author_id=user_ids[0])
+
+        post_ids = (await db.execute(text("SELECT id FROM post ORDER BY id"))).scalars().all()
+        # Ids up front: each path ends with the comment's own id (see make_path)
+        sequence = func.pg_get_serial_sequence(Comment.__tablename__, "id")
+        comment_ids = (await db.execute(
+            select(func.nextval(sequence)).select_from(
+                func.generate_series(1, args.comments if post_ids else 0)
+            )
+        )).scalars().all()
+        comments = []
+        # Earlier comments per post: about a third of the comments reply to one
+        threads: Dict[int, List[dict]] = {}
+        for id in comment_ids:
+            post_id = rng.choice(post_ids)
+            earlier = threads.setdefault(post_id, [])
+            parent = rng.choice(earlier) if earlier and rng.random() < 0.3 else None
+            comments.append({
+                "id": id,
+                "content": sentence(rng, rng.randint(4, 20)),
+                "post_id": post_id,
+                "author_id": rng.choice(user_ids),
+                "parent_id": parent["id"] if parent else None,
+                "path": make_path(parent["path"] if parent else None, id),
+            })
+            earlier.append(comments[-1])
+        for batch in batches(comments, settings.DB_BULK_BATCH_SIZE):
+            await db.execute(insert(Comment), batch)
+        await db.commit()
+        # Comments went in through Core, not CRUDComment
+        await post.recount_comments(db)
+
+    async with async_engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+    await async_engine.dispose()
+    print(
+        f"seeded {len(user_ids)} users, {len(post_ids)} posts, {len(tag_names)} tags, "
+        f"{len(comments)} comments in {time.perf_counter() - started:.1f}s"
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--tags", type=int, default=50)
+    parser.add_argument("--comments", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--reset", action="store_true", help="truncate every table first (destroys data)"
+    )
+    asyncio.run(seed(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
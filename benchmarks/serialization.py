@@ -0,0 +1,87 @@
+"""Time spent turning a page of ORM posts into a JSON body.
+
+Compares the previous path (``parse_obj_as`` + ``jsonable_encoder`` +
+``json.dumps``) with ``app.core.serialization`` on transient ``Post`` rows
+shaped like a ``GET /posts/`` page; no database is needed::
+
+    python -m benchmarks.serialization --items 100 --rounds 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+import app.db.base  # noqa: F401  (configures all mappers)
+from app.core.serialization import dump, render
+from app.db.models.comment import Comment, make_path
+from app.db.models.post import Post
+from app.db.models.tag import Tag
+from app.db.models.user import User
+from app.schemas.post import Post as PostSchema, PostSummary
+from benchmarks.seed import WORDS, user_email
+from benchmarks.stats import percentile
+
+def make_page(items: int, comments: int) -> List[Post]:
+    authors = [
+        User(id=n, email=user_email(n), full_name=f"User {n}", is_active=True, is_superuser=False)
+        for n in range(10)
+    ]
+    tags = [Tag(id=n, name=word, post_count=0) for n, word in enumerate(WORDS[:20])]
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    page = []
+    for n in range(items):
+        created = started + timedelta(minutes=n)
+        page.append(Post(
+            id=n, title=" ".join(WORDS[n % 10:n % 10 + 5]), content=" ".join(WORDS) * 4,
+            author=authors[n % len(authors)], created_at=created, updated_at=None,
+            comment_count=comments, view_count=n * 7, unique_view_count=n * 3,
+            tags=tags[n % 15:n % 15 + 3],
+            comments=[
+                Comment(id=n * comments + c, content=" ".join(WORDS[:12]),
+                        author=authors[c % len(authors)], created_at=created,
+                        parent_id=None, path=make_path(None, n * comments + c))
+                for c in range(comments)
+            ],
+        ))
+    return page
+
+def previous(response_model: Any, page: List[Post]) -> bytes:
+    return json.dumps(jsonable_encoder(parse_obj_as(response_model, page))).encode()
+
+def current(response_model: Any, page: List[Post]) -> bytes:
+    return render(dump(response_model, page))
+
+def measure(encode: Callable[[Any, List[Post]], bytes], response_model: Any,
+            page: List[Post], rounds: int) -> List[float]:
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        encode(response_model, page)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=5, help="per post, for ?expand=true")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    page = make_page(args.items, args.comments)
+    for label, response_model in (
+        ("summary", List[PostSummary]),
+        ("expand=true", List[PostSchema]),
+    ):
+        # Both paths must produce the same document
+        assert json.loads(previous(response_model, page)) == json.loads(current(response_model, page))
+        for name, encode in (("previous", previous), ("orjson", current)):
+            samples = measure(encode, response_model, page, args.rounds)
+            print(
+                f"{label:<12} {name:<9} p50={percentile(samples, 50):7.2f}ms "
+                f"p95={percentile(samples, 95):7.2f}ms"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""initial schema
+
+Revision ID: 0001_initial_schema
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_initial_schema'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_superuser', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_user_email'), 'user', ['email'], unique=True)
+    op.create_index(op.f('ix_user_id'), 'user', ['id'], unique=False)
+
+    op.create_table(
+        'tag',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_tag_id'), 'tag', ['id'], unique=False)
+    op.create_index(op.f('ix_tag_name'), 'tag', ['name'], unique=True)
+
+    op.create_table(
+        'post',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_post_id'), 'post', ['id'], unique=False)
+    op.create_index(op.f('ix_post_title'), 'post', ['title'], unique=False)
+
+    op.create_table(
+        'post_tag',
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id']),
+        sa.ForeignKeyConstraint(['tag_id'], ['tag.id']),
+        sa.PrimaryKeyConstraint('post_id', 'tag_id'),
+    )
+
+    op.create_table(
+        'comment',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=True),
+        sa.Column('author_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['author_id'], ['user.id']),
+        sa.ForeignKeyConstraint(['post_id'], ['post.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_comment_id'), 'comment', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_comment_id'), table_name='comment')
+    op.drop_table('comment')
+    op.drop_table('post_tag')
+    op.drop_index(op.f('ix_post_title'), table_name='post')
+    op.drop_index(op.f('ix_post_id'), table_name='post')
+    op.drop_table('post')
+    op.drop_index(op.f('ix_tag_name'), table_name='tag')
+    op.drop_index(op.f('ix_tag_id'), table_name='tag')
+    op.drop_table('tag')
+    op.drop_index(op.f('ix_user_id'), table_name='user')
+    op.drop_index(op.f('ix_user_email'), table_name='user')
+    op.drop_table('user')
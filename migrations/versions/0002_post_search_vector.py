@@ -0,0 +1,45 @@
+"""post full-text search vector
+
+Revision ID: 0002_post_search_vector
+Revises: 0001_initial_schema
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_post_search_vector'
+down_revision = '0001_initial_schema'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    # Stored generated column: Postgres keeps it in sync on every write,
+    # existing rows are backfilled by the ALTER
+    op.add_column(
+        'post',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'ix_post_search_vector', 'post', ['search_vector'], unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_search_vector', table_name='post')
+    op.drop_column('post', 'search_vector')
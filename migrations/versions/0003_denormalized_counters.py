@@ -0,0 +1,51 @@
+"""denormalized comment and post counters
+
+Revision ID: 0003_denormalized_counters
+Revises: 0002_post_search_vector
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_denormalized_counters'
+down_revision = '0002_post_search_vector'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'post',
+        sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'tag',
+        sa.Column('post_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    # Backfill with one grouped UPDATE per table
+    op.execute(
+        """
+        UPDATE post SET comment_count = c.n
+        FROM (SELECT post_id, count(*) AS n FROM comment GROUP BY post_id) AS c
+        WHERE c.post_id = post.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE tag SET post_count = p.n
+        FROM (SELECT tag_id, count(*) AS n FROM post_tag GROUP BY tag_id) AS p
+        WHERE p.tag_id = tag.id
+        """
+    )
+    op.create_index('ix_post_comment_count_id', 'post', ['comment_count', 'id'], unique=False)
+    op.create_index('ix_tag_post_count_id', 'tag', ['post_count', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tag_post_count_id', table_name='tag')
+    op.drop_index('ix_post_comment_count_id', table_name='post')
+    op.drop_column('tag', 'post_count')
+    op.drop_column('post', 'comment_count')
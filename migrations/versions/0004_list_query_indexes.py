@@ -0,0 +1,63 @@
+"""indexes for list queries
+
+Revision ID: 0004_list_query_indexes
+Revises: 0003_denormalized_counters
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_list_query_indexes'
+down_revision = '0003_denormalized_counters'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns), one per list query's filter + keyset ordering
+INDEXES = [
+    # GET /posts/ (newest first) and its cursor pages
+    ('ix_post_created_at_id', 'post', ['created_at', 'id']),
+    # CRUDPost.get_multi_by_author
+    ('ix_post_author_id_created_at_id', 'post', ['author_id', 'created_at', 'id']),
+    # GET /posts/?tag_id=; the primary key (post_id, tag_id) only serves post -> tags
+    ('ix_post_tag_tag_id_post_id', 'post_tag', ['tag_id', 'post_id']),
+    # GET /comments/?post_id=
+    ('ix_comment_post_id_created_at_id', 'comment', ['post_id', 'created_at', 'id']),
+    # GET /comments/
+    ('ix_comment_created_at_id', 'comment', ['created_at', 'id']),
+    # comment.author_id foreign key (deleting or listing a user's comments)
+    ('ix_comment_author_id', 'comment', ['author_id']),
+]
+
+# Duplicates of the primary keys, and post.title which no query filters on
+REDUNDANT = [
+    ('ix_user_id', 'user', ['id']),
+    ('ix_tag_id', 'tag', ['id']),
+    ('ix_post_id', 'post', ['id']),
+    ('ix_post_title', 'post', ['title']),
+    ('ix_comment_id', 'comment', ['id']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, but doesn't block writes
+    # on a live database while the indexes build
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True
+            )
+        for name, table, _ in REDUNDANT:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in REDUNDANT:
+            op.create_index(
+                name, table, columns, unique=False, postgresql_concurrently=True
+            )
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
@@ -0,0 +1,33 @@
+"""trigram index on tag.name
+
+Revision ID: 0005_tag_name_trigram_index
+Revises: 0004_list_query_indexes
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_tag_name_trigram_index'
+down_revision = '0004_list_query_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Prefix (ILIKE 'x%') and similarity (%) lookups of the autocomplete fallback
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_tag_name_trgm', 'tag', ['name'], unique=False,
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_tag_name_trgm', table_name='tag', postgresql_concurrently=True)
+    # The extension is left installed: other objects may depend on it
@@ -0,0 +1,60 @@
+"""author and tag follows
+
+Revision ID: 0006_follows
+Revises: 0005_tag_name_trigram_index
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_follows'
+down_revision = '0005_tag_name_trigram_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_follow',
+        sa.Column('follower_id', sa.Integer(), nullable=False),
+        sa.Column('author_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['author_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('follower_id', 'author_id'),
+    )
+    op.create_index(
+        'ix_user_follow_author_id_follower_id', 'user_follow', ['author_id', 'follower_id'],
+        unique=False,
+    )
+    op.create_table(
+        'tag_follow',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'tag_id'),
+    )
+    op.create_index(
+        'ix_tag_follow_tag_id_user_id', 'tag_follow', ['tag_id', 'user_id'], unique=False
+    )
+    # New tables, so the counters start at zero: nothing to backfill
+    op.add_column(
+        'user',
+        sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'tag',
+        sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('tag', 'follower_count')
+    op.drop_column('user', 'follower_count')
+    op.drop_index('ix_tag_follow_tag_id_user_id', table_name='tag_follow')
+    op.drop_table('tag_follow')
+    op.drop_index('ix_user_follow_author_id_follower_id', table_name='user_follow')
+    op.drop_table('user_follow')
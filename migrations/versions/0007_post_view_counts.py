@@ -0,0 +1,39 @@
+"""post view counters
+
+Revision ID: 0007_post_view_counts
+Revises: 0006_follows
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_post_view_counts'
+down_revision = '0006_follows'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'post',
+        sa.Column('view_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'post',
+        sa.Column('unique_view_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_post_view_count_id', 'post', ['view_count', 'id'], unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_post_view_count_id', table_name='post', postgresql_concurrently=True)
+    op.drop_column('post', 'unique_view_count')
+    op.drop_column('post', 'view_count')
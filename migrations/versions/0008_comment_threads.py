@@ -0,0 +1,43 @@
+"""threaded comment replies
+
+Revision ID: 0008_comment_threads
+Revises: 0007_post_view_counts
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_comment_threads'
+down_revision = '0007_post_view_counts'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('comment', sa.Column('parent_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'comment_parent_id_fkey', 'comment', 'comment', ['parent_id'], ['id'],
+        ondelete='CASCADE',
+    )
+    op.add_column('comment', sa.Column('path', sa.String(collation='C'), nullable=True))
+    # Existing comments are all top-level: the path is the id alone (make_path)
+    op.execute("UPDATE comment SET path = lpad(id::text, 10, '0')")
+    op.alter_column('comment', 'path', nullable=False)
+    op.create_index('ix_comment_post_id_path', 'comment', ['post_id', 'path'], unique=False)
+    op.create_index(
+        'ix_comment_post_id_path_top_level', 'comment', ['post_id', 'path'], unique=False,
+        postgresql_where=sa.text('parent_id IS NULL'),
+    )
+    op.create_index('ix_comment_parent_id', 'comment', ['parent_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comment_parent_id', table_name='comment')
+    op.drop_index('ix_comment_post_id_path_top_level', table_name='comment')
+    op.drop_index('ix_comment_post_id_path', table_name='comment')
+    op.drop_column('comment', 'path')
+    op.drop_constraint('comment_parent_id_fkey', 'comment', type_='foreignkey')
+    op.drop_column('comment', 'parent_id')
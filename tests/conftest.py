@@ -1,5 +1,7 @@
 import pytest
+from contextlib import contextmanager
 from httpx import AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
@@ -27,3 +29,19 @@ async def db_session(test_db_setup):
     async with AsyncSessionLocal() as session:
         yield session
         await session.rollback()
+
+@pytest.fixture
+def query_counter():
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return counter
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+import fakeredis
+import pytest
+from starlette.requests import Request
+from app.core import cache
+from app.core.cache import cached_response, detail_key, index_key, list_index_key
+from app.core.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_build():
+    calls = 0
+
+    @cached_response("singleflight-test", ttl=60, id_param="item_id")
+    async def read_item(item_id: int):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": item_id}
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    responses = await asyncio.gather(
+        *(read_item(item_id=1, cache_request=request) for _ in range(20))
+    )
+
+    assert calls == 1
+    assert {response.body for response in responses} == {b'{"id":1}'}
+    await read_item(item_id=1, cache_request=request)
+    assert calls == 2  # nothing in flight any more (and no Redis here)
+
+@pytest.mark.asyncio
+async def test_single_flight_shares_exceptions():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise LookupError("gone")
+
+    results = await asyncio.gather(
+        *(flights.do("key", fail) for _ in range(3)), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [LookupError] * 3
+    assert not flights.running("key")
+
+@pytest.mark.asyncio
+async def test_changes_that_keep_timestamps_are_not_304():
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    item = {
+        "id": 1, "created_at": created, "updated_at": None, "comment_count": 1,
+        "comments": [{"id": 1, "content": "First", "created_at": created}],
+    }
+
+    @cached_response("validators-test", ttl=60, id_param="item_id")
+    async def read_item(item_id: int):
+        return item
+
+    def request(**headers: str) -> Request:
+        raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+        return Request({"type": "http", "method": "GET", "headers": raw})
+
+    response = await read_item(item_id=1, cache_request=request())
+    etag = response.headers["ETag"]
+    assert "Last-Modified" not in response.headers
+    response = await read_item(item_id=1, cache_request=request(if_none_match=etag))
+    assert response.status_code == 304
+
+    # A comment edit and a counter bump leave every timestamp as it was
+    item["comments"][0]["content"] = "Edited"
+    item["comment_count"] = 2
+    response = await read_item(item_id=1, cache_request=request(if_none_match=etag))
+    assert response.status_code == 200
+    response = await read_item(
+        item_id=1, cache_request=request(if_modified_since="Tue, 02 Jan 2024 00:00:00 GMT")
+    )
+    assert response.status_code == 200
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(cache, "redis", client)
+    return client
+
+@pytest.mark.asyncio
+async def test_cache_indexes_stay_bounded(fake_redis, monkeypatch):
+    monkeypatch.setattr(cache, "DROP_CHUNK", 2)
+    details = {detail_key("idx", n): (b"{}", {}) for n in range(5)}
+    await cache.set_cached_many("idx", details, 60, is_list=False, generation=0)
+    await cache.set_cached("cache:idx:list:a", "idx", b"[]", {}, 60, is_list=True, generation=0)
+    assert await fake_redis.zcard(index_key("idx")) == 6
+    assert await fake_redis.zrange(list_index_key("idx"), 0, -1) == [b"cache:idx:list:a"]
+    assert 0 < await fake_redis.ttl(index_key("idx")) <= 60 + cache.settings.CACHE_STALE_SECONDS
+
+    # Members whose entry expired are dropped by the next write
+    await fake_redis.zadd(index_key("idx"), {"cache:idx:gone": time.time() - 1})
+    await cache.set_cached(
+        detail_key("idx", 9), "idx", b"{}", {}, 60, is_list=False, generation=0
+    )
+    assert await fake_redis.zscore(index_key("idx"), "cache:idx:gone") is None
+
+    await cache.invalidate("idx", 1)
+    assert not await fake_redis.exists("cache:idx:list:a", detail_key("idx", 1))
+    assert await fake_redis.exists(detail_key("idx", 2))
+
+    await cache.flush("idx")
+    assert await fake_redis.keys("cache:idx*") == [b"cache:idx:generation"]
+
+@pytest.mark.asyncio
+async def test_build_racing_an_invalidation_is_not_stored(fake_redis):
+    started, finish = asyncio.Event(), asyncio.Event()
+    version = "old"
+
+    @cached_response("race-test", ttl=60, id_param="item_id")
+    async def read_item(item_id: int):
+        read = version
+        started.set()
+        await finish.wait()
+        return {"id": item_id, "version": read}
+
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    build = asyncio.create_task(read_item(item_id=1, cache_request=request))
+    await started.wait()
+    # A write commits and invalidates while the build holds what it read before
+    version = "new"
+    await cache.invalidate("race-test", 1)
+    finish.set()
+
+    assert (await build).body == b'{"id":1,"version":"old"}'
+    assert not await fake_redis.exists(detail_key("race-test", 1))
+    response = await read_item(item_id=1, cache_request=request)
+    assert response.body == b'{"id":1,"version":"new"}'
+    assert await fake_redis.hget(detail_key("race-test", 1), "generation") == b"1"
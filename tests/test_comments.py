@@ -1 +1,81 @@
+import pytest
+from app.crud.comment import comment
+from app.crud.post import post
+from app.crud.tag import tag
+from app.crud.user import user
+from app.schemas.comment import CommentCreate
+from app.schemas.post import PostCreate, PostUpdate
+from app.schemas.tag import TagCreate
+from app.schemas.user import UserCreate
 
+@pytest.mark.asyncio
+async def test_counters_follow_writes(db_session):
+    db_user = await user.create(
+        db_session,
+        obj_in=UserCreate(email="counteruser@example.com", password="password")
+    )
+    first = await tag.create(db_session, obj_in=TagCreate(name="counter-first"))
+    second = await tag.create(db_session, obj_in=TagCreate(name="counter-second"))
+    db_post = await post.create_with_tags(
+        db_session,
+        obj_in=PostCreate(title="Counter Post", content="Counter content"),
+        author_id=db_user.id,
+        tag_ids=[first.id],
+    )
+    comments = [
+        await comment.create(
+            db_session,
+            obj_in=CommentCreate(content=f"Comment {i}"),
+            post_id=db_post.id,
+            author_id=db_user.id,
+        )
+        for i in range(3)
+    ]
+    await comment.remove(db_session, id=comments[0].id)
+    db_post = await post.update_with_tags(
+        db_session, db_obj=await post.get(db_session, id=db_post.id),
+        obj_in=PostUpdate(tag_ids=[second.id]),
+    )
+
+    assert (await post.get(db_session, id=db_post.id)).comment_count == 2
+    assert (await tag.get(db_session, id=first.id, load=None)).post_count == 0
+    assert (await tag.get(db_session, id=second.id, load=None)).post_count == 1
+    assert await post.recount_comments(db_session) == 0
+    assert await tag.recount_posts(db_session) == 0
+
+@pytest.mark.asyncio
+async def test_threads_are_paginated_by_top_level_comment(db_session):
+    db_user = await user.create(
+        db_session, obj_in=UserCreate(email="threaduser@example.com", password="password")
+    )
+    db_post = await post.create_with_tags(
+        db_session, obj_in=PostCreate(title="Thread Post", content="c"), author_id=db_user.id
+    )
+
+    async def reply(content, parent=None):
+        return await comment.create(
+            db_session, obj_in=CommentCreate(content=content), post_id=db_post.id,
+            author_id=db_user.id, parent=parent,
+        )
+
+    first = await reply("first")
+    second = await reply("second")
+    answer = await reply("answer", first)
+    nested = await reply("nested", answer)
+    late = await reply("late answer", first)
+
+    page = await comment.get_threads(db_session, post_id=db_post.id, limit=1)
+    assert [c.id for c in page] == [first.id, answer.id, nested.id, late.id]
+    assert [c.depth for c in page] == [0, 1, 2, 1]
+    page = await comment.get_threads(
+        db_session, post_id=db_post.id, limit=1, cursor=page.next_cursor
+    )
+    assert [c.id for c in page] == [second.id]
+
+    subtree = await comment.get_subtree(db_session, db_obj=answer)
+    assert [c.id for c in subtree] == [answer.id, nested.id]
+
+    # Replies go with their comment
+    await comment.remove(db_session, id=answer.id)
+    await db_session.refresh(db_post)
+    assert db_post.comment_count == 3
@@ -0,0 +1,73 @@
+import fakeredis
+import pytest
+from types import SimpleNamespace
+from app.core import cache, feeds
+from app.core.feeds import fan_out, read_feed
+from app.crud.post import post
+from app.crud.tag import tag
+from app.crud.user import user
+from app.schemas.post import PostCreate
+from app.schemas.tag import TagCreate
+from app.schemas.user import UserCreate
+
+@pytest.mark.asyncio
+async def test_feed_has_followed_authors_and_tags_newest_first(db_session):
+    reader, author, other = [
+        await user.create(db_session, obj_in=UserCreate(email=f"feed{i}@example.com", password="password"))
+        for i in range(3)
+    ]
+    followed_tag = await tag.create(db_session, obj_in=TagCreate(name="feed-followed"))
+    await user.follow(db_session, follower_id=reader.id, author_id=author.id)
+    await user.follow(db_session, follower_id=reader.id, tag_id=followed_tag.id)
+
+    by_author = await post.create_with_tags(
+        db_session, obj_in=PostCreate(title="By author", content="c"), author_id=author.id
+    )
+    unrelated = await post.create_with_tags(
+        db_session, obj_in=PostCreate(title="Unrelated", content="c"), author_id=other.id
+    )
+    tagged = await post.create_with_tags(
+        db_session, obj_in=PostCreate(title="Tagged", content="c"), author_id=other.id,
+        tag_ids=[followed_tag.id],
+    )
+
+    first = await read_feed(db_session, user_id=reader.id, limit=1)
+    rest = await read_feed(db_session, user_id=reader.id, limit=10, cursor=first.next_cursor)
+    assert [p.id for p in first + rest] == [tagged.id, by_author.id]
+    assert unrelated.id not in [p.id for p in rest]
+    await db_session.refresh(author)
+    assert author.follower_count == 1
+
+    assert await user.unfollow(db_session, follower_id=reader.id, author_id=author.id)
+    assert [p.id for p in await read_feed(db_session, user_id=reader.id)] == [tagged.id]
+
+@pytest.mark.asyncio
+async def test_only_a_trimmed_feed_falls_back_to_postgres(monkeypatch):
+    monkeypatch.setattr(cache, "redis", fakeredis.FakeAsyncRedis())
+    monkeypatch.setattr(feeds.settings, "FEED_MAX_LENGTH", 3)
+    stored, popular, queries = [2, 1], [5], []
+
+    async def get_feed_ids(db, *, user_id, fanned_out=None, before=None, limit=20):
+        queries.append(fanned_out)
+        ids = {True: stored, False: popular, None: stored + popular}[fanned_out]
+        return sorted((id for id in ids if before is None or id < before), reverse=True)[:limit]
+
+    async def get_many(db, ids, load=None):
+        return [SimpleNamespace(id=id) for id in ids]
+
+    monkeypatch.setattr(feeds.post, "get_feed_ids", get_feed_ids)
+    monkeypatch.setattr(feeds.post, "get_many", get_many)
+
+    # Shorter than a page, but complete: no fallback
+    assert [p.id for p in await read_feed(None, user_id=1, limit=10)] == [5, 2, 1]
+    assert None not in queries
+
+    # Pushes trim the oldest post: pages past the stored feed come from Postgres
+    for id in (3, 4):
+        stored.append(id)
+        await fan_out(id, [1])
+    queries.clear()
+    first = await read_feed(None, user_id=1, limit=2)
+    assert [p.id for p in first] == [5, 4] and None not in queries
+    rest = await read_feed(None, user_id=1, limit=10, cursor=first.next_cursor)
+    assert [p.id for p in rest] == [3, 2, 1] and queries[-1] is None
@@ -0,0 +1,140 @@
+import json
+import smtplib
+from uuid import uuid4
+import pytest
+from redis.asyncio import Redis
+from app.core import cache, jobs
+from app.core.config import settings
+from app.core.jobs import Worker
+from app.core.notifications import welcome_emails
+from utils import send_email
+
+def test_retry_delay_backs_off(monkeypatch):
+    monkeypatch.setattr(settings, "JOBS_RETRY_BASE_SECONDS", 10.0)
+    assert [jobs.retry_delay(attempt) for attempt in (1, 2, 3)] == [10.0, 20.0, 40.0]
+    assert jobs.retry_delay(30) == 3600.0
+
+@pytest.mark.asyncio
+async def test_worker_runs_handlers_per_batch(monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_BACKEND", "memory")
+    monkeypatch.setattr(send_email, "outbox", [])
+    worker = Worker(redis=None, consumer="test")
+
+    results = await worker.run_handler("user_created", [
+        {"user_id": 1, "email": "first@example.com", "full_name": "First"},
+        {"user_id": 2, "email": "second@example.com", "full_name": None},
+    ])
+
+    assert results == [None, None]
+    assert [message["To"] for message in send_email.outbox] == [
+        "first@example.com", "second@example.com"
+    ]
+    assert welcome_emails is jobs.HANDLERS["user_created"]
+
+    # Unknown kinds and failing handlers fail every job of the batch
+    unknown = await worker.run_handler("no_such_kind", [{}])
+    assert isinstance(unknown[0], LookupError)
+
+    async def broken(payloads):
+        raise ConnectionRefusedError("smtp down")
+    monkeypatch.setitem(jobs.HANDLERS, "broken", broken)
+    assert [type(error) for error in await worker.run_handler("broken", [{}, {}])] == [
+        ConnectionRefusedError, ConnectionRefusedError
+    ]
+
+@pytest.fixture
+async def redis_client(monkeypatch):
+    # A stream of its own per test, removed afterwards
+    monkeypatch.setattr(settings, "JOBS_STREAM", f"test-jobs-{uuid4().hex}")
+    client = Redis(
+        host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASSWORD
+    )
+    yield client
+    await client.delete(settings.JOBS_STREAM, jobs.retry_key(), jobs.dead_key())
+    await client.close()
+
+@pytest.mark.asyncio
+async def test_failed_jobs_are_retried_then_dead(redis_client, monkeypatch):
+    monkeypatch.setattr(cache, "redis", redis_client)
+    monkeypatch.setattr(settings, "JOBS_ENABLED", True)
+    monkeypatch.setattr(settings, "JOBS_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(settings, "JOBS_RETRY_BASE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "JOBS_CLAIM_IDLE_MS", 0)
+    batches = []
+
+    async def flaky(payloads):
+        batches.append([payload["n"] for payload in payloads])
+        return [ConnectionRefusedError("smtp down") if payload["n"] == 1 else None
+                for payload in payloads]
+    monkeypatch.setitem(jobs.HANDLERS, "flaky", flaky)
+    crashed = Worker(redis_client, consumer="crashed")
+    worker = Worker(redis_client, consumer="test")
+    await worker.ensure_group()
+    await jobs.enqueue("flaky", n=1)
+    await jobs.enqueue("flaky", n=2)
+
+    # Delivered to a worker that dies before acknowledging: claimed by another
+    assert len(await crashed.read()) == 2
+    entries = await worker.claim_stale()
+    assert len(entries) == 2
+    await worker.process(entries)
+
+    assert batches == [[1, 2]]
+    assert await redis_client.xlen(settings.JOBS_STREAM) == 0
+    (retry, _), = await redis_client.zrange(jobs.retry_key(), 0, -1, withscores=True)
+    assert json.loads(retry)["attempts"] == 1
+
+    # Due at once with no backoff: back on the stream for its second attempt
+    await worker.promote_due_retries()
+    assert await redis_client.zcard(jobs.retry_key()) == 0
+    entries = await worker.read()
+    assert entries[0][1][b"attempts"] == b"1"
+    await worker.process(entries)
+
+    assert batches == [[1, 2], [1]]
+    assert await redis_client.xlen(settings.JOBS_STREAM) == 0
+    assert await redis_client.zcard(jobs.retry_key()) == 0
+    (_, dead), = await redis_client.xrange(jobs.dead_key())
+    assert dead[b"kind"] == b"flaky"
+    assert dead[b"attempts"] == b"2"
+    assert b"smtp down" in dead[b"error"]
+    assert (await redis_client.xpending(settings.JOBS_STREAM, settings.JOBS_GROUP))["pending"] == 0
+
+def test_smtp_errors_fail_only_their_message(monkeypatch):
+    delivered = []
+
+    class FakeSMTP:
+        def __init__(self, host, port, timeout):
+            pass
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def send_message(self, message):
+            to = message["To"]
+            if to == "refused@example.com":
+                raise smtplib.SMTPRecipientsRefused({to: (550, b"No such user")})
+            if to == "rejected@example.com":
+                raise smtplib.SMTPDataError(554, b"Message rejected")
+            if to == "hangup@example.com":
+                raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+            delivered.append(to)
+
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    messages = [
+        send_email.build_message(to, "Subject", "Body") for to in (
+            "first@example.com", "refused@example.com", "rejected@example.com",
+            "second@example.com", "hangup@example.com", "third@example.com",
+        )
+    ]
+
+    results = send_email._send_smtp(messages)
+
+    assert delivered == ["first@example.com", "second@example.com"]
+    assert [type(error) for error in results] == [
+        type(None), smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+        type(None), smtplib.SMTPServerDisconnected, smtplib.SMTPServerDisconnected,
+    ]
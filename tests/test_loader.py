@@ -0,0 +1,34 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.crud.base import CRUDBase
+
+class CountingCRUD(CRUDBase):
+    # Only what the loader calls
+    def __init__(self, ids):
+        self.ids = ids
+        self.queries = []
+
+    async def get_many(self, db, ids, *, load="default"):
+        self.queries.append(list(ids))
+        return [SimpleNamespace(id=id) for id in ids if id in self.ids]
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_one_query_until_commit():
+    crud = CountingCRUD({1, 2, 3})
+    async with AsyncSession() as db:
+        found = await asyncio.gather(
+            crud.get_batched(db, 3), crud.get_many_batched(db, [1, 9, 3, 1]),
+        )
+        assert found[0].id == 3
+        assert [row.id for row in found[1]] == [1, 3]
+        assert [sorted(ids) for ids in crud.queries] == [[1, 3, 9]]
+
+        # Memoized, misses included
+        assert [row.id for row in await crud.get_many_batched(db, [9, 3])] == [3]
+        assert len(crud.queries) == 1
+
+        await db.commit()
+        assert [row.id for row in await crud.get_many_batched(db, [3, 2])] == [3, 2]
+        assert crud.queries[1:] == [[3, 2]]
@@ -0,0 +1,6 @@
+from app.db.schema import expected_revisions
+
+def test_single_migration_head():
+    # Startup verification compares the database against this set; two heads
+    # mean two branches were merged without a merge revision
+    assert len(expected_revisions()) == 1
@@ -1,8 +1,16 @@
+import asyncio
+import json
 import pytest
 from httpx import AsyncClient
 from app.core.security import create_access_token
+from app.crud.comment import comment
+from app.crud.post import post
+from app.crud.tag import tag
+from app.crud.user import user
+from app.schemas.comment import CommentCreate, CommentUpdate
 from app.schemas.user import UserCreate
 from app.schemas.post import PostCreate
+from app.schemas.tag import TagCreate
 
 @pytest.mark.asyncio
 async def test_create_post(async_client: AsyncClient, db_session):
@@ -31,3 +39,230 @@ async def test_create_post(async_client: AsyncClient, db_session):
     assert response.status_code == 200
     assert response.json()["title"] == "Test Post"
     assert response.json()["author"]["email"] == "postuser@example.com"
+
+@pytest.mark.asyncio
+async def test_read_posts_query_count(async_client: AsyncClient, db_session, query_counter):
+    db_user = await user.create(
+        db_session,
+        obj_in=UserCreate(email="loaduser@example.com", password="password")
+    )
+    tag_ids = []
+    for i in range(3):
+        db_tag = await tag.create(db_session, obj_in=TagCreate(name=f"load-tag-{i}"))
+        tag_ids.append(db_tag.id)
+    for i in range(20):
+        db_post = await post.create_with_tags(
+            db_session,
+            obj_in=PostCreate(title=f"Load Post {i}", content="Load content"),
+            author_id=db_user.id,
+            tag_ids=tag_ids,
+        )
+        await comment.create(
+            db_session,
+            obj_in=CommentCreate(content="Load comment"),
+            post_id=db_post.id,
+            author_id=db_user.id,
+        )
+
+    # posts + author + comment count, tags
+    with query_counter() as statements:
+        response = await async_client.get("/api/v1/posts/?limit=100")
+    assert response.status_code == 200
+    assert len(response.json()) >= 20
+    assert len(statements) == 2
+    assert "comments" not in response.json()[0]
+    assert response.json()[0]["comment_count"] == 1
+
+    # posts + author, comments + comment authors, tags
+    with query_counter() as statements:
+        response = await async_client.get("/api/v1/posts/?limit=100&expand=true")
+    assert response.status_code == 200
+    assert len(statements) == 3
+
+@pytest.mark.asyncio
+async def test_read_posts_cursor_pagination(async_client: AsyncClient, db_session):
+    db_user = await user.create(
+        db_session,
+        obj_in=UserCreate(email="cursoruser@example.com", password="password")
+    )
+    for i in range(7):
+        await post.create_with_tags(
+            db_session,
+            obj_in=PostCreate(title=f"Cursor Post {i}", content="Cursor content"),
+            author_id=db_user.id,
+        )
+
+    seen = []
+    response = await async_client.get("/api/v1/posts/?limit=3")
+    while True:
+        assert response.status_code == 200
+        seen.extend(item["id"] for item in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        response = await async_client.get("/api/v1/posts/", params={"limit": 3, "cursor": cursor})
+
+    assert len(seen) == len(set(seen))
+    assert seen == sorted(seen, reverse=True)
+
+@pytest.mark.asyncio
+async def test_read_posts_invalid_cursor(async_client: AsyncClient):
+    response = await async_client.get("/api/v1/posts/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_import_export_round_trip(async_client: AsyncClient, db_session):
+    db_user = await user.create(
+        db_session,
+        obj_in=UserCreate(email="bulkadmin@example.com", password="password")
+    )
+    db_user = await user.update(db_session, db_obj=db_user, obj_in={"is_superuser": True})
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': db_user.email})}"}
+    lines = [
+        json.dumps({"title": f"Bulk Post {i}", "content": "Bulk content", "tags": ["bulk-a", "bulk-b"][: i % 3]})
+        for i in range(25)
+    ]
+
+    response = await async_client.post(
+        "/api/v1/posts/import", content="\n".join(lines), headers=headers
+    )
+    assert response.status_code == 200
+    assert response.json() == {"imported": 25}
+    assert (await tag.get_by_name(db_session, name="bulk-b")).post_count == 8
+
+    response = await async_client.get("/api/v1/posts/export", headers=headers)
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    bulk = [row for row in exported if row["title"].startswith("Bulk Post")]
+    assert len(bulk) == 25
+    assert bulk[2]["tags"] == ["bulk-a", "bulk-b"]
+
+    response = await async_client.post(
+        "/api/v1/posts/import", content=lines[0] + "\n{\"title\": 1}", headers=headers
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"]["line"] == 2
+
+@pytest.mark.asyncio
+async def test_read_post_conditional_get(async_client: AsyncClient, db_session):
+    db_user = await user.create(
+        db_session,
+        obj_in=UserCreate(email="etaguser@example.com", password="password")
+    )
+    db_post = await post.create_with_tags(
+        db_session,
+        obj_in=PostCreate(title="ETag Post", content="ETag content"),
+        author_id=db_user.id,
+    )
+
+    response = await async_client.get(f"/api/v1/posts/{db_post.id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = await async_client.get(
+        f"/api/v1/posts/{db_post.id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # A new comment changes the embedded comments, so the tag no longer matches
+    await comment.create(
+        db_session,
+        obj_in=CommentCreate(content="ETag comment"),
+        post_id=db_post.id,
+        author_id=db_user.id,
+    )
+    response = await async_client.get(
+        f"/api/v1/posts/{db_post.id}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+@pytest.mark.asyncio
+async def test_post_changes_without_new_timestamps_are_not_304(
+    async_client: AsyncClient, db_session
+):
+    db_user = await user.create(
+        db_session, obj_in=UserCreate(email="stampuser@example.com", password="password")
+    )
+    db_post = await post.create_with_tags(
+        db_session, obj_in=PostCreate(title="Stamp Post", content="c"), author_id=db_user.id
+    )
+    db_comment = await comment.create(
+        db_session, obj_in=CommentCreate(content="Before"), post_id=db_post.id,
+        author_id=db_user.id,
+    )
+    response = await async_client.get(f"/api/v1/posts/{db_post.id}")
+    etag = response.headers["ETag"]
+    assert "Last-Modified" not in response.headers
+    since = {"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}
+
+    # Comment edit: neither the post's nor the comment's timestamps move
+    await comment.update(db_session, db_obj=db_comment, obj_in=CommentUpdate(content="After"))
+    for headers in ({"If-None-Match": etag}, since):
+        response = await async_client.get(f"/api/v1/posts/{db_post.id}", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["comments"][0]["content"] == "After"
+
+    # Counter bump, which keeps updated_at
+    await post.add_views(db_session, [{"post_id": db_post.id, "views": 3, "unique_views": 1}])
+    response = await async_client.get(f"/api/v1/posts/{db_post.id}", headers=since)
+    assert response.status_code == 200
+    assert response.json()["view_count"] == 3
+
+@pytest.mark.asyncio
+async def test_read_posts_batch(async_client: AsyncClient, db_session, query_counter):
+    db_user = await user.create(
+        db_session,
+        obj_in=UserCreate(email="batchuser@example.com", password="password")
+    )
+    posts = [
+        await post.create_with_tags(
+            db_session,
+            obj_in=PostCreate(title=f"Batch Post {i}", content="Batch content"),
+            author_id=db_user.id,
+        )
+        for i in range(5)
+    ]
+    ids = [posts[3].id, posts[0].id, 999999, posts[3].id]
+
+    # posts + author, comments + comment authors, tags: for all ids at once
+    with query_counter() as statements:
+        response = await async_client.get(f"/api/v1/posts/batch?ids={','.join(map(str, ids))}")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [posts[3].id, posts[0].id]
+    assert len(statements) <= 3
+
+    # Concurrent lookups on one session share those queries
+    with query_counter() as statements:
+        found = await asyncio.gather(*(post.get_batched(db_session, id) for id in ids))
+    assert [db_post and db_post.id for db_post in found] == [
+        posts[3].id, posts[0].id, None, posts[3].id
+    ]
+    assert len(statements) == 3
+
+    response = await async_client.get("/api/v1/posts/batch?ids=1,x")
+    assert response.status_code == 422
+
+@pytest.mark.asyncio
+async def test_flushed_views_rank_trending_fallback(async_client: AsyncClient, db_session):
+    author = await user.create(
+        db_session, obj_in=UserCreate(email="viewsuser@example.com", password="password")
+    )
+    quiet, read = [
+        await post.create_with_tags(
+            db_session, obj_in=PostCreate(title=f"Views {i}", content="c"), author_id=author.id
+        )
+        for i in range(2)
+    ]
+    await post.add_views(db_session, [
+        {"post_id": read.id, "views": 5, "unique_views": 2},
+        {"post_id": quiet.id, "views": 1, "unique_views": 1},
+    ])
+    await post.add_views(db_session, [{"post_id": read.id, "views": 2, "unique_views": 3}])
+
+    await db_session.refresh(read)
+    assert (read.view_count, read.unique_view_count) == (7, 3)
+    # No view data in Redis: all-time most viewed
+    response = await async_client.get("/api/v1/posts/trending?limit=2")
+    assert [p["id"] for p in response.json()] == [read.id, quiet.id]
@@ -0,0 +1,62 @@
+import asyncio
+import fakeredis
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+from app.core import cache, ratelimit
+from app.core.config import settings
+from app.core.ratelimit import Limit, parse_limit
+from utils.deps import login_rate_limit
+
+def test_parse_limit():
+    assert parse_limit("30/minute") == Limit(30, 0.5)
+    with pytest.raises(ValueError):
+        parse_limit("30 per minute")
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_never_overdraw_bucket():
+    ratelimit.local_buckets.clear()
+    limit = Limit(capacity=10, rate=0.001)
+
+    results = await asyncio.gather(*(ratelimit.take("test:burst", limit) for _ in range(50)))
+
+    assert sum(allowed for allowed, _ in results) == 10
+    # The next token is a full refill interval (1000s) away
+    assert all(990 < retry_after <= 1000 for allowed, retry_after in results if not allowed)
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_never_overdraw_redis_bucket(monkeypatch):
+    # The Lua token bucket, taken from concurrently through two workers' clients
+    server = fakeredis.FakeServer()
+    workers = [fakeredis.FakeAsyncRedis(server=server) for _ in range(2)]
+    ratelimit.local_buckets.clear()
+    limit = Limit(capacity=10, rate=0.001)
+
+    async def take_through(worker):
+        # take() picks its client before its first await
+        monkeypatch.setattr(cache, "redis", worker)
+        return await ratelimit.take("test:redis-burst", limit)
+
+    results = await asyncio.gather(*(take_through(workers[n % 2]) for n in range(50)))
+
+    assert sum(allowed for allowed, _ in results) == 10
+    assert all(990 < retry_after <= 1000 for allowed, retry_after in results if not allowed)
+    # Decided by Redis, not by the in-process fallback
+    assert not ratelimit.local_buckets._buckets
+    assert float((await workers[0].hget("ratelimit:test:redis-burst", "tokens"))) < 1
+
+@pytest.mark.asyncio
+async def test_login_limit_returns_429_with_retry_after(monkeypatch):
+    ratelimit.local_buckets.clear()
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN", "2/minute")
+    request = Request({"type": "http", "client": ("203.0.113.7", 4711), "headers": []})
+
+    await login_rate_limit(request)
+    await login_rate_limit(request)
+    with pytest.raises(HTTPException) as exc_info:
+        await login_rate_limit(request)
+
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "30"
+    # Another client has its own bucket
+    await login_rate_limit(Request({"type": "http", "client": ("203.0.113.8", 4711), "headers": []}))
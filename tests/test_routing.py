@@ -0,0 +1,92 @@
+import fakeredis
+import pytest
+from starlette.requests import Request
+from app.core import cache
+from app.core.cache import cached_response, detail_key
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.db import routing
+from app.db.routing import ReplicaSet, caller_key, get_db
+from app.db.session import make_engine
+
+class FakePool:
+    def __init__(self, checked_out: int):
+        self.checked_out = checked_out
+
+    def checkedout(self) -> int:
+        return self.checked_out
+
+class FakeEngine:
+    # Only what ReplicaSet.choose reads
+    def __init__(self, checked_out: int = 0):
+        self.pool = FakePool(checked_out)
+
+def test_replica_selection_skips_unhealthy_and_lagging(monkeypatch):
+    monkeypatch.setattr(settings, "DB_REPLICA_MAX_LAG_SECONDS", 5.0)
+    busy, idle, lagging, down = (FakeEngine(n) for n in (7, 2, 0, 0))
+    replica_set = ReplicaSet([busy, idle, lagging, down])
+    assert replica_set.choose() is None  # nothing checked yet
+    replica_set.healthy.update({busy: True, idle: True, lagging: True, down: False})
+    replica_set.lag.update({busy: 0.0, idle: 1.5, lagging: 30.0, down: None})
+
+    monkeypatch.setattr(settings, "DB_REPLICA_SELECTION", "round_robin")
+    assert [replica_set.choose() for _ in range(4)] == [busy, idle, busy, idle]
+    monkeypatch.setattr(settings, "DB_REPLICA_SELECTION", "least_connections")
+    assert replica_set.choose() is idle
+
+@pytest.mark.asyncio
+async def test_reads_stick_to_primary_after_a_write(monkeypatch):
+    # Sessions never connect here, so the URL needn't exist
+    replica = make_engine("postgresql+asyncpg://reader@replica/blogdb")
+    replica_set = ReplicaSet([replica])
+    replica_set.healthy[replica], replica_set.lag[replica] = True, 0.0
+    monkeypatch.setattr(routing, "replicas", replica_set)
+    token = create_access_token(data={"sub": "reader@example.com"})
+    request = Request({
+        "type": "http", "method": "GET", "client": ("203.0.113.9", 4711),
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+    })
+    assert caller_key(request.scope) == "user:reader@example.com"
+
+    session = await get_db(request).__anext__()
+    assert session.bind is replica
+
+    await routing.mark_wrote(caller_key(request.scope))
+    session = await get_db(request).__anext__()
+    assert session.bind is not replica
+
+@pytest.mark.asyncio
+async def test_lagging_replica_does_not_refill_the_cache(monkeypatch):
+    monkeypatch.setattr(cache, "redis", fakeredis.FakeAsyncRedis())
+    monkeypatch.setattr(routing, "_local_sticky", {})
+    replica = make_engine("postgresql+asyncpg://reader@replica/blogdb")
+    replica_set = ReplicaSet([replica])
+    # Within DB_REPLICA_MAX_LAG_SECONDS, but not yet replaying the write below
+    replica_set.healthy[replica], replica_set.lag[replica] = True, 1.0
+    monkeypatch.setattr(routing, "replicas", replica_set)
+
+    @cached_response("lag-test", ttl=60, id_param="item_id")
+    async def read_item(item_id: int, db):
+        return {"id": item_id, "title": "Old" if db.bind is replica else "New"}
+
+    async def get(ip: str):
+        request = Request({"type": "http", "method": "GET", "client": (ip, 4711), "headers": []})
+        db = await get_db(request).__anext__()
+        response = await read_item(item_id=1, db=db, cache_request=request)
+        return request, response.body
+
+    # A write by 203.0.113.1 commits and invalidates the entry
+    await routing.mark_wrote("ip:203.0.113.1")
+    await cache.invalidate("lag-test", 1)
+
+    # Another client's read goes to the replica, but the entry is built on the primary
+    request, body = await get("203.0.113.2")
+    assert request.state.replica
+    assert body == b'{"id":1,"title":"New"}'
+    assert await cache.redis.hget(detail_key("lag-test", 1), "body") == body
+
+    # The writer reads past the cache, even past an entry from before its write
+    await cache.redis.hset(detail_key("lag-test", 1), "body", b'{"id":1,"title":"Old"}')
+    request, body = await get("203.0.113.1")
+    assert request.state.read_your_writes and not request.state.replica
+    assert body == b'{"id":1,"title":"New"}'
@@ -1 +1,12 @@
+from app.core.autocomplete import TagIndex
 
+def test_tag_index_suggests_most_used_prefix_matches():
+    index = TagIndex()
+    index.load([(1, "Python", 5), (2, "pytest", 9), (3, "PyPI", 5), (4, "rust", 50), (5, "py", 1)])
+
+    assert [t["name"] for t in index.suggest("PY", 3)] == ["pytest", "PyPI", "Python"]
+    assert [t["name"] for t in index.suggest("pyt", 10)] == ["pytest", "Python"]
+    assert index.suggest("go", 10) == []
+    # Memoized answers are dropped on reload
+    index.load([(6, "golang", 2)])
+    assert [t["id"] for t in index.suggest("go", 10)] == [6]
@@ -0,0 +1,31 @@
+import json
+import logging
+import re
+import pytest
+from httpx import AsyncClient
+from app.core.config import settings
+
+@pytest.mark.asyncio
+async def test_server_timing_header(async_client: AsyncClient):
+    response = await async_client.get("/api/v1/posts/?cursor=not-a-cursor")
+    metrics = re.findall(r'(\w+);dur=[\d.]+(?:;desc="[^"]*")?', response.headers["Server-Timing"])
+    assert metrics == ["db", "redis", "serialize", "app", "total"]
+
+@pytest.mark.asyncio
+async def test_query_budget_warning(async_client: AsyncClient, caplog, monkeypatch):
+    monkeypatch.setattr(settings, "REQUEST_QUERY_BUDGET", -1)
+    with caplog.at_level(logging.INFO, logger="app.core.timing"):
+        await async_client.get("/api/v1/posts/?cursor=not-a-cursor")
+    record = caplog.records[-1]
+    assert record.levelno == logging.WARNING
+    line = json.loads(record.getMessage())
+    assert line["route"] == "/api/v1/posts/"
+    assert line["over_query_budget"] is True
+
+@pytest.mark.asyncio
+async def test_metrics_labelled_by_route_template(async_client: AsyncClient):
+    await async_client.get("/api/v1/posts/?cursor=not-a-cursor")
+    response = await async_client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_requests_total{method="GET",route="/api/v1/posts/",status="400"}' in response.text
+    assert "db_pool_connections" in response.text
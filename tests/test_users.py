@@ -1 +1,63 @@
+import asyncio
+import time
+import pytest
+from app.core import cache, principals as principals_module
+from app.core.principals import PrincipalCache
+from app.schemas.user import User
 
+def make_principal(id: int) -> User:
+    return User(id=id, email=f"user{id}@example.com", is_active=True, is_superuser=False)
+
+def test_principal_cache_evicts_least_recently_used():
+    principals = PrincipalCache(maxsize=2, ttl=60)
+    principals.set("a", make_principal(1))
+    principals.set("b", make_principal(2))
+    assert principals.get("a").id == 1
+    principals.set("c", make_principal(3))
+    assert principals.get("b") is None
+    assert principals.get("a").id == 1
+    assert principals.get("c").id == 3
+
+def test_principal_cache_expires_entries(monkeypatch):
+    principals = PrincipalCache(maxsize=10, ttl=5)
+    principals.set("a", make_principal(1))
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 6)
+    assert principals.get("a") is None
+
+class FakeRedis:
+    """One pub/sub channel shared by every "worker" in the test."""
+
+    def __init__(self):
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def publish(self, channel, data):
+        await self.messages.put({"type": "message", "channel": channel, "data": data})
+
+    def pubsub(self):
+        return self
+
+    async def subscribe(self, channel):
+        pass
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_workers(monkeypatch):
+    monkeypatch.setattr(cache, "redis", FakeRedis())
+    other_worker = PrincipalCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(principals_module, "principal_cache", other_worker)
+    listener = asyncio.create_task(principals_module.listen())
+    await asyncio.sleep(0)
+    other_worker.set("a@example.com", make_principal(1))
+    other_worker.set("b@example.com", make_principal(2))
+
+    # As published by a different process after deactivating the user
+    await cache.redis.publish(principals_module.INVALIDATIONS_CHANNEL, '["a@example.com"]')
+    await asyncio.sleep(0.01)
+    listener.cancel()
+
+    assert other_worker.get("a@example.com") is None
+    assert other_worker.get("b@example.com").id == 2
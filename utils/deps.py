@@ -1,11 +1,16 @@
-from typing import Optional
-from fastapi import Depends, HTTPException, status
+import math
+from typing import AsyncIterator, Callable, List
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from jose import JWTError
+from app.core.metrics import RATE_LIMITED
+from app.core.principals import get_principal, store_principal
+from app.core.ratelimit import parse_limit, take
 from app.core.security import decode_token
+from app.core.views import record
 from app.crud.user import user
-from app.db.session import get_db
+from app.db.routing import caller_key, get_db
 from app.schemas.user import User
 from app.core.config import settings
 
@@ -28,10 +33,16 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    # Cached principals skip the database; the session above is never used then
+    principal = await get_principal(email)
+    if principal is not None:
+        return principal
     db_user = await user.get_by_email(db, email=email)
     if db_user is None:
         raise credentials_exception
-    return db_user
+    principal = User.from_orm(db_user)
+    await store_principal(email, principal)
+    return principal
 
 async def get_current_active_user(
     current_user: User = Depends(get_current_user),
@@ -48,3 +59,53 @@ async def get_current_active_superuser(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+def batch_ids(
+    ids: str = Query(..., description="Comma-separated ids, e.g. 1,2,3", example="1,2,3"),
+) -> List[int]:
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be comma-separated integers")
+    if not parsed or len(parsed) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=422, detail=f"Between 1 and {settings.BATCH_MAX_IDS} ids are accepted"
+        )
+    return parsed
+
+def rate_limit(scope: str, limit_setting: str, per_user: bool = False) -> Callable:
+    """Dependency applying the token bucket ``settings.<limit_setting>`` per
+    client IP, or per authenticated user with ``per_user``; 429 when empty."""
+    parse_limit(getattr(settings, limit_setting))
+
+    async def enforce(key: str) -> None:
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        limit = parse_limit(getattr(settings, limit_setting))
+        allowed, retry_after = await take(f"{scope}:{key}", limit)
+        if not allowed:
+            RATE_LIMITED.labels(scope).inc()
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    if per_user:
+        async def limit_user(current_user: User = Depends(get_current_active_user)) -> None:
+            await enforce(f"user:{current_user.id}")
+        return limit_user
+
+    async def limit_ip(request: Request) -> None:
+        # Behind a proxy run uvicorn with --proxy-headers so this is the client
+        await enforce(f"ip:{request.client.host if request.client else 'unknown'}")
+    return limit_ip
+
+login_rate_limit = rate_limit("login", "RATE_LIMIT_LOGIN")
+post_write_rate_limit = rate_limit("post_write", "RATE_LIMIT_POST_WRITE", per_user=True)
+comment_write_rate_limit = rate_limit("comment_write", "RATE_LIMIT_COMMENT_WRITE", per_user=True)
+
+async def count_post_view(request: Request, post_id: int) -> AsyncIterator[None]:
+    # After the response is sent (also for cached and 304 responses)
+    yield
+    await record(post_id, caller_key(request.scope))
@@ -0,0 +1,25 @@
+"""Recompute denormalized counters (post.comment_count, tag.post_count and the
+follower_count of users and tags).
+
+Counters are maintained on every write, so this is only needed after manual
+SQL, bulk imports that bypass the CRUD layer, or a suspected drift::
+
+    python -m utils.repair_counters
+"""
+import asyncio
+from app.crud.post import post
+from app.crud.tag import tag
+from app.crud.user import user
+from app.db.session import AsyncSessionLocal
+
+async def repair_counters() -> None:
+    async with AsyncSessionLocal() as db:
+        posts_fixed = await post.recount_comments(db)
+        tags_fixed = await tag.recount_posts(db)
+        followers_fixed = await user.recount_followers(db)
+    print(f"post.comment_count: {posts_fixed} rows fixed")
+    print(f"tag.post_count: {tags_fixed} rows fixed")
+    print(f"follower_count: {followers_fixed} rows fixed")
+
+if __name__ == "__main__":
+    asyncio.run(repair_counters())
@@ -1 +1,55 @@
+"""Outbound email, called from background jobs only (see app.core.notifications).
 
+EMAIL_BACKEND "smtp" delivers through SMTP_HOST (MailHog in docker-compose);
+"memory" appends to ``outbox`` instead, for tests.
+"""
+import asyncio
+import smtplib
+from email.message import EmailMessage
+from typing import List, Optional
+from app.core.config import settings
+
+outbox: List[EmailMessage] = []
+
+def build_message(to: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.EMAILS_FROM
+    message["To"] = to
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+def _send_smtp(messages: List[EmailMessage]) -> List[Optional[Exception]]:
+    # One connection for the whole batch; an error fails only its message,
+    # unless the connection is lost, which fails the rest of the batch too
+    results: List[Optional[Exception]] = []
+    with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30) as smtp:
+        if settings.SMTP_TLS:
+            smtp.starttls()
+        if settings.SMTP_USER:
+            smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD or "")
+        for position, message in enumerate(messages):
+            try:
+                smtp.send_message(message)
+            except smtplib.SMTPServerDisconnected as exc:
+                results.extend([exc] * (len(messages) - position))
+                break
+            except smtplib.SMTPException as exc:
+                # Refused recipient or sender, rejected data, ...
+                results.append(exc)
+            except OSError as exc:
+                # Socket error or timeout: the connection is gone
+                results.extend([exc] * (len(messages) - position))
+                break
+            else:
+                results.append(None)
+    return results
+
+async def send_emails(messages: List[EmailMessage]) -> List[Optional[Exception]]:
+    """Send ``messages``; one result per message, None when it was accepted."""
+    if not messages:
+        return []
+    if settings.EMAIL_BACKEND == "memory":
+        outbox.extend(messages)
+        return [None] * len(messages)
+    return await asyncio.to_thread(_send_smtp, messages)